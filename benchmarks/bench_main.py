@@ -0,0 +1,152 @@
+'''
+End-to-end benchmark of main.main against a local FakeWiki, with the
+sheets swapped out for generated records. Reports wall time, API request
+counts, KiB transferred and edits per second for each number of pending
+records, e.g.
+
+    python benchmarks/bench_main.py
+    python benchmarks/bench_main.py --records 100 --latency 0.05 --failure-rate 0.01
+    python benchmarks/bench_main.py --records 100 --conflict-rate 0.2
+'''
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from get_records import SourceRecords
+from record import Record
+from rate_limit import TokenBucket
+from fake_wiki import FakeWiki
+
+INFOBOX_PAGE = '''{{{{speedrun_infobox
+|rta_record=[https://youtu.be/rta{i} {rta_time}]
+|ss_record=[https://youtu.be/ss{i} {ss_time}]
+|other_info=Generated page
+}}}}
+Guide text for star {i}.
+{guide}'''
+BOWSER_INFOBOX_PAGE = '''{{{{speedrun_infobox_bowser_level
+|rta_record=[https://youtu.be/rtac{i} {rta_time} (Course)] / [https://youtu.be/rtar{i} {rta_time} (with Red Coins)]
+|ss_record=[https://youtu.be/ssc{i} {ss_time}] / [https://youtu.be/ssr{i} {ss_time}]
+|throw_record=[https://youtu.be/throw{i} 20.00]
+}}}}
+Guide text for star {i}.
+{guide}'''
+MULTI_100C_INFOBOX_PAGE = '''{{{{speedrun_infobox
+|rta_record=[https://youtu.be/rta1{i} {rta_time} (Strategy A)] / [https://youtu.be/rta2{i} {rta_time} (Strategy B)]
+|ss_record=[https://youtu.be/ss{i} {ss_time}]
+}}}}
+Guide text for star {i}.
+{guide}'''
+
+# Real guide pages have a few sections of
+# strategy write-ups after the infobox
+GUIDE_SECTIONS = ''.join(f'\n== Strategy {i} ==\n' + 'Strategy write-up. ' * 100 for i in range(1, 6))
+
+def generate_records(wiki: FakeWiki, record_count: int) -> tuple[list[Record], list[Record]]:
+    '''
+    Create pages on the fake wiki, and return new RTA and single star
+    records for them (record_count in total). Most pages are normal
+    star pages, with every tenth being a Bowser stage and every tenth
+    being a multi-strategy 100c star, like the real RTA Guide.
+    '''
+    rta_records = []
+    ss_records = []
+    i = 0
+    while len(rta_records) + len(ss_records) < record_count:
+        if i % 10 == 3:
+            page_star_name = f'Bowser Stage {i}'
+            wiki.add_page('RTA Guide/' + page_star_name, BOWSER_INFOBOX_PAGE.format(i=i, rta_time='50.00', ss_time='45.00', guide=GUIDE_SECTIONS))
+            rta_records.append(Record('49.00', f'https://youtu.be/new{i}c', page_star_name + ' - Course'))
+            rta_records.append(Record('49.50', f'https://youtu.be/new{i}r', page_star_name + ' Red Coins'))
+            ss_records.append(Record('44.00', f'https://youtu.be/newss{i}', page_star_name + ' Red Coins'))
+        elif i % 10 == 7:
+            page_star_name = f'Star {i} 100 Coins'
+            wiki.add_page('RTA Guide/' + page_star_name, MULTI_100C_INFOBOX_PAGE.format(i=i, rta_time='1:30.00', ss_time='1:25.00', guide=GUIDE_SECTIONS))
+            rta_records.append(Record('1:29.00', f'https://youtu.be/new{i}a', page_star_name, 1))
+            rta_records.append(Record('1:29.50', f'https://youtu.be/new{i}b', page_star_name, 2))
+        else:
+            page_star_name = f'Star {i}'
+            wiki.add_page('RTA Guide/' + page_star_name, INFOBOX_PAGE.format(i=i, rta_time='30.00', ss_time='25.00', guide=GUIDE_SECTIONS))
+            rta_records.append(Record('29.00', f'https://youtu.be/new{i}', page_star_name))
+            # Only some stars get a new single star record as well
+            if i % 2 == 0:
+                ss_records.append(Record('24.00', f'https://youtu.be/newss{i}', page_star_name))
+        i += 1
+    # Trim whichever list went over, keeping the total exact
+    extra = len(rta_records) + len(ss_records) - record_count
+    if extra:
+        rta_records = rta_records[:-extra]
+    return rta_records, ss_records
+
+def run_benchmark(record_count: int, latency: float, failure_rate: float, edit_rate: float, \
+                  conflict_rate: float = 0.0) -> dict:
+    '''
+    Run main.main once against a fresh FakeWiki,
+    and return the benchmark's results
+    '''
+    wiki = FakeWiki(latency=latency, failure_rate=failure_rate, conflict_rate=conflict_rate)
+    new_rta_records, new_ss_records = generate_records(wiki, record_count)
+    main.API = wiki.start()
+    main.EDIT_LIMITER = TokenBucket(edit_rate, max(1, int(edit_rate)))
+    # Swap the sheets out for the generated records
+    main.get_creds = lambda: None
+    new_records = {'rta': new_rta_records, 'ss': new_ss_records}
+    main.get_source_records = lambda source, creds: SourceRecords(source, list(new_records[source.name]), [])
+    try:
+        # main writes its log, page cache and local records
+        # to the working directory, so keep those out of the repo
+        with tempfile.TemporaryDirectory() as run_dir:
+            cwd = os.getcwd()
+            os.chdir(run_dir)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    t1 = time.perf_counter()
+                    main.main()
+                    wall_time = time.perf_counter() - t1
+            finally:
+                os.chdir(cwd)
+    finally:
+        wiki.stop()
+    edits = wiki.get_edit_count()
+    return {
+        'records'       : record_count,
+        'wall_time'     : wall_time,
+        'requests'      : sum(count for action, count in wiki.request_counts.items() if not ':' in action and action != 'failed'),
+        'request_counts': dict(wiki.request_counts),
+        'transfer_kib'  : sum(wiki.transfer_bytes.values()) / 1024,
+        'edits'         : edits,
+        'edits_per_sec' : edits / wall_time if wall_time else 0.0
+    }
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description='Benchmark main.main against a local fake MediaWiki API')
+    parser.add_argument('--records', type=int, nargs='+', default=[10, 100, 1000],
+                        help='numbers of pending records to benchmark')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds of latency added to every API request')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='fraction of API requests that fail with an HTTP 500')
+    parser.add_argument('--edit-rate', type=float, default=1000.0,
+                        help=f'edits per second allowed by the rate limiter (main uses {main.EDIT_RATE})')
+    parser.add_argument('--conflict-rate', type=float, default=0.0,
+                        help='fraction of edits that conflict with someone else editing the page first')
+    parser.add_argument('--retry-delay', type=float, default=main.PAGE_UPDATE_RETRY_DELAY,
+                        help='seconds to wait before retrying a failed edit (doubles for each retry)')
+    args = parser.parse_args()
+    main.PAGE_UPDATE_RETRY_DELAY = args.retry_delay
+
+    print(f"{'records':>8} {'wall (s)':>9} {'requests':>9} {'KiB':>8} {'edits':>6} {'edits/s':>8}  request counts")
+    for record_count in args.records:
+        results = run_benchmark(record_count, args.latency, args.failure_rate, args.edit_rate, args.conflict_rate)
+        print(f"{results['records']:>8} {results['wall_time']:>9.3f} {results['requests']:>9} {results['transfer_kib']:>8.1f} "
+              f"{results['edits']:>6} {results['edits_per_sec']:>8.1f}  {results['request_counts']}")
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,189 @@
+'''
+Benchmark of the RTA (with and without its extensions sheet) and single
+star sheet parsers on synthetic sheets at 1x, 10x and 100x the size of the
+real ones, both from scratch and with a block cache from a parse of the
+sheet before one star's record was changed (as on a typical run). Records
+parse time and peak memory, and exits with an error if either has gotten
+worse than the stored baseline by more than the tolerance (or if a record
+from the extensions sheet that can't be told apart from another star's
+ends up on that star), e.g.
+
+    python benchmarks/bench_parsers.py
+    python benchmarks/bench_parsers.py --update-baseline
+    python benchmarks/bench_parsers.py --write-debug-files
+
+Times are compared relative to a fixed calibration workload, so that a
+baseline recorded on one machine is still meaningful on another.
+'''
+import argparse
+import copy
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import RecordTime
+from get_records import parse_rta_values, parse_ss_values
+from sources import RTA_DEBUG_FILE, SS_DEBUG_FILE, RTA_RANGE, RTA_EXTENSIONS_RANGE
+from synthetic_sheets import generate_rta_values, generate_ss_values, UNMATCHED_EXTENSION_TIME, HEADER_EXTENSION_LINK
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_baseline.json')
+PARSERS = {
+    'rta'    : (generate_rta_values, parse_rta_values),
+    # RTA sheet along with its extensions sheet
+    'rta+ext': (lambda scale: generate_rta_values(scale, with_extensions=True),
+                lambda values, block_cache=None: parse_rta_values(values, block_cache, RTA_RANGE + [RTA_EXTENSIONS_RANGE])),
+    'ss'     : (generate_ss_values, parse_ss_values)
+}
+
+# Minimum seconds each timing sample should take, so that
+# fast benchmarks aren't swamped by timer and scheduler noise
+MIN_SAMPLE_TIME = 0.2
+
+def get_best_time(function, *args, repeat: int = 5) -> float:
+    '''
+    Get the fastest time per call of a function out of repeat
+    samples (each of which calls it enough times to take at
+    least MIN_SAMPLE_TIME), in seconds
+    '''
+    t1 = time.perf_counter()
+    function(*args)
+    calls = max(1, int(MIN_SAMPLE_TIME / max(time.perf_counter() - t1, 1e-6)))
+    best_time = float('inf')
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        for _ in range(calls):
+            function(*args)
+        best_time = min(best_time, (time.perf_counter() - t1) / calls)
+    return best_time
+
+def calibrate() -> float:
+    '''
+    Time a fixed pure Python workload that
+    parse times can be measured relative to
+    '''
+    def workload():
+        text = {}
+        for i in range(200000):
+            text[str(i)] = f'{i % 60}:{i % 100:02}.{i % 97:02}'.split(':')
+    return get_best_time(workload)
+
+def change_one_star(parser_name: str, values: list | dict) -> list | dict:
+    '''
+    Get a copy of synthetic sheet values with the
+    record time of the star halfway down changed
+    '''
+    values = copy.deepcopy(values)
+    if parser_name.startswith('rta'):
+        rows = values['sheets'][0]['data'][0]['rowData']
+        record_rows = [row for row in rows if row and len(row['values']) > 1]
+        record_rows[len(record_rows) // 2]['values'][1]['effectiveValue']['stringValue'] = '1.23'
+    else:
+        record_rows = [row for row in values if len(row) > 2 and row[2].startswith('=HYPERLINK')]
+        row = record_rows[len(record_rows) // 2]
+        row[2] = row[2].rsplit(';', 1)[0] + ';"1""23")'
+    return values
+
+def run_benchmark(parser_name: str, scale: int, repeat: int, calibration_time: float, cached: bool = False) -> dict:
+    generate_values, parse_values = PARSERS[parser_name]
+    values = generate_values(scale)
+    block_cache = None
+    if cached:
+        block_cache = {}
+        parse_values(values, block_cache)
+        values = change_one_star(parser_name, values)
+    def parse():
+        # Times are only ever parsed once per run for real, so
+        # don't let earlier runs' cached RecordTimes help out
+        RecordTime.parse.cache_clear()
+        # Parsing updates the block cache, so every parse needs its own copy
+        return parse_values(values, None if block_cache == None else block_cache.copy())
+    parse_time = get_best_time(parse, repeat=repeat)
+    # Measure memory separately, since tracing slows parsing down a lot
+    gc.collect()
+    tracemalloc.start()
+    records = parse()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Extension records that can't be told apart from another star's
+    # must never be put on some other star's page
+    for record in records:
+        if record.time == UNMATCHED_EXTENSION_TIME or (record.link or '').startswith(HEADER_EXTENSION_LINK) \
+           and record.star_name != record.link[len(HEADER_EXTENSION_LINK):]:
+            raise AssertionError(f'Extensions sheet record {record.link} was merged into {record.star_name}')
+    return {
+        'records'      : len(records),
+        'parse_time'   : parse_time,
+        'relative_time': parse_time / calibration_time,
+        'peak_memory'  : peak_memory
+    }
+
+def write_debug_files() -> None:
+    '''
+    Write 1x synthetic sheets to the files the default
+    sources are read from when creds is 'DEBUG'
+    '''
+    for path, values in [(RTA_DEBUG_FILE, generate_rta_values()), (SS_DEBUG_FILE, generate_ss_values())]:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(values, file)
+        print(f'Wrote {path}')
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description='Benchmark the sheet parsers on synthetic sheets')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help='sizes of the synthetic sheets, relative to the real ones')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of times to run each parser (the fastest run is used)')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='how much slower (or bigger) than the baseline a run can be before failing')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline file to compare against')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='store the results as the new baseline instead of comparing against it')
+    parser.add_argument('--write-debug-files', action='store_true',
+                        help="write 1x synthetic sheets for the 'DEBUG' creds and exit")
+    args = parser.parse_args()
+
+    if args.write_debug_files:
+        write_debug_files()
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+
+    calibration_time = calibrate()
+    results = {}
+    failures = []
+    print(f"{'benchmark':>20} {'records':>8} {'time (ms)':>10} {'relative':>9} {'peak (KiB)':>11}  vs. baseline")
+    for scale in args.scales:
+        for parser_name, cached in [(parser_name, cached) for cached in [False, True] for parser_name in PARSERS]:
+            name = f"{parser_name}@{scale}x{'+cache' if cached else ''}"
+            result = results[name] = run_benchmark(parser_name, scale, args.repeat, calibration_time, cached)
+            comparison = ''
+            if name in baseline:
+                time_ratio = result['relative_time'] / baseline[name]['relative_time']
+                memory_ratio = result['peak_memory'] / baseline[name]['peak_memory']
+                comparison = f'time x{time_ratio:.2f}, memory x{memory_ratio:.2f}'
+                if time_ratio > 1 + args.tolerance or memory_ratio > 1 + args.tolerance:
+                    failures.append(name)
+                    comparison += '  FAILED'
+            print(f"{name:>20} {result['records']:>8} {result['parse_time'] * 1000:>10.2f} "
+                  f"{result['relative_time']:>9.3f} {result['peak_memory'] / 1024:>11.1f}  {comparison}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=4)
+        print(f'Saved baseline to {args.baseline}')
+    elif failures:
+        print(f"Slower or bigger than baseline: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main_benchmark()
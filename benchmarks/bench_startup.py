@@ -0,0 +1,140 @@
+'''
+Startup time benchmark. Checks that importing main stays within a time
+budget (measured with python -X importtime) without pulling in the Google
+API client or requests, and that a run with nothing to update (against a
+local stand-in for the Drive API) stays within its own budget, e.g.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --import-budget 40 --run-budget 80
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import get_records
+import sources
+
+# Modules that should only ever be imported once there's something to update
+DEFERRED_MODULES = ('google', 'googleapiclient', 'google_auth_oauthlib', 'httplib2', 'requests')
+MODIFIED_TIME = '2024-01-01T00:00:00.000Z'
+
+def get_import_time(repeat: int) -> tuple[float, list[str]]:
+    '''
+    Get the fastest cumulative import time of main (in ms) out of repeat
+    runs, along with any deferred modules that were imported anyway
+    '''
+    best_time = float('inf')
+    deferred_imports = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stderr
+        for line in output.splitlines():
+            if not line.startswith('import time:') or line.endswith('| package'):
+                continue
+            _, cumulative, name = line.split('|')
+            module = name.strip()
+            if name.rstrip() == ' main':
+                best_time = min(best_time, int(cumulative) / 1000)
+            if module.split('.')[0] in DEFERRED_MODULES and not module in deferred_imports:
+                deferred_imports.append(module)
+    return best_time, deferred_imports
+
+def start_fake_drive() -> ThreadingHTTPServer:
+    '''
+    Serve the same modifiedTime for every file, like the Drive API would
+    for sheets that haven't been modified since they were last processed
+    '''
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({'modifiedTime': MODIFIED_TIME}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *args):
+            pass
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def write_file(path: str, data: dict) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(data, file)
+
+def get_run_time(repeat: int) -> tuple[float, list[str]]:
+    '''
+    Get the fastest time (in ms) out of repeat runs of importing and
+    running main with nothing to update, along with any deferred
+    modules that were imported anyway
+    '''
+    server = start_fake_drive()
+    drive_url = f'http://127.0.0.1:{server.server_port}/drive/v3/files/'
+    script = f'''
+import sys, time
+t1 = time.perf_counter()
+sys.path.insert(0, {REPO_DIR!r})
+import get_records, main
+get_records.DRIVE_FILES_URL = {drive_url!r}
+main.main()
+print((time.perf_counter() - t1) * 1000)
+print(' '.join(sorted(module for module in sys.modules if module.split('.')[0] in {DEFERRED_MODULES!r})))
+'''
+    best_time = float('inf')
+    deferred_imports = []
+    try:
+        with tempfile.TemporaryDirectory() as run_dir:
+            # A saved token that isn't about to expire, and fingerprints saying
+            # the default sources' sheets were last processed at MODIFIED_TIME
+            expiry = (datetime.now(timezone.utc) + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            write_file(os.path.join(run_dir, get_records.TOKEN_FILE), {'token': 'token', 'expiry': expiry,
+                                                                     'scopes': get_records.SCOPES})
+            write_file(os.path.join(run_dir, get_records.FINGERPRINTS_FILE),
+                       {source.name: {'modified_time': MODIFIED_TIME, 'parser_hash': get_records.PARSER_HASH}
+                        for source in sources.get_board_sources(sources.get_default_boards())})
+            for _ in range(repeat):
+                output = subprocess.run([sys.executable, '-c', script], cwd=run_dir,
+                                        capture_output=True, text=True, check=True).stdout.splitlines()
+                best_time = min(best_time, float(output[-2]))
+                deferred_imports = output[-1].split()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return best_time, deferred_imports
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description='Check that startup and runs with nothing to update stay fast')
+    parser.add_argument('--import-budget', type=float, default=60,
+                        help='most milliseconds importing main can take')
+    parser.add_argument('--run-budget', type=float, default=120,
+                        help='most milliseconds importing and running main with nothing to update can take')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs (the fastest is used)')
+    args = parser.parse_args()
+
+    failures = []
+    for name, (time_ms, deferred_imports), budget in [
+            ('import main', get_import_time(args.repeat), args.import_budget),
+            ('nothing to update', get_run_time(args.repeat), args.run_budget)]:
+        print(f'{name:>17}: {time_ms:7.1f}ms (budget {budget:.0f}ms)')
+        if time_ms > budget:
+            failures.append(f'{name} took {time_ms:.1f}ms')
+        if deferred_imports:
+            failures.append(f"{name} imported {', '.join(deferred_imports)}")
+    if failures:
+        print('Failed: ' + '; '.join(failures))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,228 @@
+import json
+import random
+import re
+import threading
+import time
+
+from collections import Counter
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class FakeWiki:
+    '''
+    Minimal in-process stand-in for the MediaWiki action API, implementing
+    just enough of query (userinfo, tokens, info, revisions), login and
+    edit for the bot to run against it (including fetching and editing just
+    the first section of a page). Logging in sets a session cookie, and
+    edits need the CSRF token of a logged in session. Every request can
+    be delayed by latency seconds, and failure_rate of requests fail with
+    an HTTP 500. Setting lag above a request's maxlag makes it fail the
+    same way a lagged wiki would, and conflict_rate of edits have someone
+    else edit the page just before them.
+    '''
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, lag: int = 0, \
+                 conflict_rate: float = 0.0, seed: int = 0) -> None:
+        self.latency: float       = latency
+        self.failure_rate: float  = failure_rate
+        self.lag: int             = lag
+        self.conflict_rate: float = conflict_rate
+        # Number of requests made for each action (plus failed requests)
+        self.request_counts: Counter = Counter()
+        # Bytes of request and response bodies (and query strings)
+        self.transfer_bytes: Counter = Counter()
+        self.__random = random.Random(seed)
+        # Pages keyed by title, each with a list of (revid, timestamp, text) revisions
+        self.__pages: dict[str, list[tuple[int, str, str]]] = {}
+        self.__revid: int = 0
+        # Fake clock for revision timestamps, so every revision gets a different one
+        self.__clock: int = int(time.time())
+        self.__lock = threading.Lock()
+        self.__server: ThreadingHTTPServer = None
+
+    def __timestamp(self) -> str:
+        self.__clock += 1
+        return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.__clock))
+
+    def add_page(self, title: str, text: str) -> None:
+        '''
+        Create (or make a new revision of) a page
+        '''
+        with self.__lock:
+            self.__revid += 1
+            self.__pages.setdefault(title, []).append((self.__revid, self.__timestamp(), text))
+
+    def get_page_text(self, title: str) -> str | None:
+        with self.__lock:
+            revisions = self.__pages.get(title)
+            return revisions[-1][2] if revisions else None
+
+    def get_edit_count(self) -> int:
+        '''
+        Get the number of successful edits made through the API
+        '''
+        return self.request_counts['edit:Success']
+
+    def start(self) -> str:
+        '''
+        Start serving on a free local port in a background
+        thread, and return the URL of the API endpoint
+        '''
+        wiki = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            def do_GET(self):
+                query = urlparse(self.path).query
+                wiki.transfer_bytes['request'] += len(query)
+                wiki.handle(self, parse_qs(query))
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                wiki.transfer_bytes['request'] += len(body)
+                wiki.handle(self, parse_qs(body))
+            def log_message(self, *args):
+                pass
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.__server.daemon_threads = True
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self.__server.server_port}/api.php'
+
+    def stop(self) -> None:
+        if self.__server:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def handle(self, handler: BaseHTTPRequestHandler, query: dict[str, list[str]]) -> None:
+        '''
+        Respond to a single API request
+        '''
+        params = {key: values[-1] for key, values in query.items()}
+        action = params.get('action', '')
+        if self.latency:
+            time.sleep(self.latency)
+        with self.__lock:
+            self.request_counts[action] += 1
+            failed = self.__random.random() < self.failure_rate
+            if failed:
+                self.request_counts['failed'] += 1
+        if failed:
+            self.__respond(handler, {'error': {'code': 'internal_api_error'}}, status=500)
+            return
+        # Like MediaWiki, any request can ask to be rejected while the wiki is lagged
+        if 'maxlag' in params and self.lag > int(params['maxlag']):
+            self.__respond(handler, {'error': {'code': 'maxlag', 'lag': self.lag}},
+                           headers={'Retry-After': '1'})
+            return
+        user = self.__get_session_user(handler)
+        if action == 'query':
+            self.__respond(handler, self.__query(params, user))
+        elif action == 'login':
+            self.__respond(handler, {'login': {'result': 'Success', 'lgusername': params.get('lgname')}},
+                           headers={'Set-Cookie': f"fakewiki_session={params.get('lgname')}; Path=/"})
+        elif action == 'edit':
+            response = self.__edit(params, user)
+            self.__respond(handler, response)
+        else:
+            self.__respond(handler, {'error': {'code': 'badvalue', 'info': f'Unrecognized action "{action}"'}})
+
+    @staticmethod
+    def __get_session_user(handler: BaseHTTPRequestHandler) -> str | None:
+        '''
+        Get the user a request's session cookie is logged in as
+        '''
+        cookies = SimpleCookie(handler.headers.get('Cookie', ''))
+        return cookies['fakewiki_session'].value if 'fakewiki_session' in cookies else None
+
+    @staticmethod
+    def __split_first_section(text: str) -> tuple[str, str]:
+        '''
+        Split page text into its first section (everything
+        before the first heading) and the rest of the page
+        '''
+        heading = re.search(r'^==.*==[ \t]*$', text, re.MULTILINE)
+        if heading == None:
+            return text, ''
+        return text[:heading.start()].rstrip('\n'), text[heading.start():]
+
+    def __query(self, params: dict[str, str], user: str | None) -> dict:
+        response = {'batchcomplete': True, 'query': {}}
+        if 'curtimestamp' in params:
+            response['curtimestamp'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        meta = params.get('meta', '').split('|')
+        if 'userinfo' in meta:
+            response['query']['userinfo'] = {'id': 1, 'name': user} if user else \
+                                            {'id': 0, 'name': '127.0.0.1', 'anon': True}
+        if 'tokens' in meta:
+            if params.get('type') == 'login':
+                response['query']['tokens'] = {'logintoken': 'logintoken+\\'}
+            else:
+                # Logged out sessions all get the same useless token
+                response['query']['tokens'] = {'csrftoken': 'csrftoken+\\' if user else '+\\'}
+        if not 'titles' in params:
+            return response
+        props = params.get('prop', '').split('|')
+        pages = []
+        with self.__lock:
+            for title in params['titles'].split('|'):
+                revisions = self.__pages.get(title)
+                if not revisions:
+                    pages.append({'title': title, 'missing': True})
+                    continue
+                revid, timestamp, text = revisions[-1]
+                page = {'title': title}
+                if 'info' in props:
+                    page['lastrevid'] = revid
+                if 'revisions' in props:
+                    if params.get('rvsection') == '0':
+                        text = self.__split_first_section(text)[0]
+                    page['revisions'] = [{
+                        'revid'    : revid,
+                        'timestamp': timestamp,
+                        'slots'    : {'main': {'content': text}}
+                    }]
+                pages.append(page)
+        response['query']['pages'] = pages
+        return response
+
+    def __edit(self, params: dict[str, str], user: str | None) -> dict:
+        title = params.get('title')
+        with self.__lock:
+            if user == None or params.get('token') != 'csrftoken+\\':
+                self.request_counts['edit:badtoken'] += 1
+                return {'error': {'code': 'badtoken'}}
+            revisions = self.__pages.get(title)
+            if not revisions and 'nocreate' in params:
+                return {'error': {'code': 'missingtitle'}}
+            # Someone else sneaks in an edit of their own
+            if revisions and self.__random.random() < self.conflict_rate:
+                self.__revid += 1
+                revisions.append((self.__revid, self.__timestamp(), revisions[-1][2] + '\nAnother edit.'))
+            # Someone else edited the page after the bot got its text
+            if revisions and params.get('basetimestamp') and revisions[-1][1] != params['basetimestamp']:
+                self.request_counts['edit:editconflict'] += 1
+                return {'error': {'code': 'editconflict'}}
+            self.request_counts['edit:Success'] += 1
+            self.__revid += 1
+            timestamp = self.__timestamp()
+            old_revid = revisions[-1][0] if revisions else 0
+            text = params.get('text', '')
+            # Editing the first section keeps the rest of the page
+            if params.get('section') == '0' and revisions:
+                rest = self.__split_first_section(revisions[-1][2])[1]
+                if rest:
+                    text = text.rstrip('\n') + '\n\n' + rest
+            self.__pages.setdefault(title, []).append((self.__revid, timestamp, text))
+            return {'edit': {'result': 'Success', 'title': title, 'oldrevid': old_revid,
+                             'newrevid': self.__revid, 'newtimestamp': timestamp}}
+
+    def __respond(self, handler: BaseHTTPRequestHandler, response: dict, status: int = 200, \
+                  headers: dict[str, str] = {}) -> None:
+        body = json.dumps(response).encode()
+        self.transfer_bytes['response'] += len(body)
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(body)
@@ -0,0 +1,186 @@
+import random
+
+# Roughly how many stars (counting Bowser stage course and red coin
+# records, and each multi-strategy 100c route separately) the real
+# RTA and single star spreadsheets have
+BASE_STAR_COUNT = 130
+# Time of extensions sheet records that can't be told apart from
+# another star's, which should never end up in the parsed records
+UNMATCHED_EXTENSION_TIME = '0.01'
+# Start of the links of extensions sheet records that may only end up
+# on the star named in the rest of the link
+HEADER_EXTENSION_LINK = 'https://youtu.be/ext-only/'
+
+def format_time(seconds: float) -> str:
+    '''
+    Format a time the way the sheets display them (e.g. 1:05.30)
+    '''
+    mins, secs = divmod(round(seconds * 100) / 100, 60)
+    return f'{int(mins)}:{secs:05.2f}' if mins else f'{secs:.2f}'
+
+def format_ss_time(seconds: float, in_formula: bool = False) -> str:
+    '''
+    Format a time the way the single star sheet does (e.g. 1'05"30),
+    with the '"' doubled up when it's inside a HYPERLINK formula
+    '''
+    mins, secs = divmod(round(seconds * 100) / 100, 60)
+    time = f'{secs:05.2f}'.replace('.', '""' if in_formula else '"')
+    return f"{int(mins)}'{time}" if mins else time
+
+def get_rta_row(label: str, is_bold: bool = False, time: str = None, link: str = None) -> dict:
+    cells = [{'effectiveValue': {'stringValue': label}}]
+    if is_bold:
+        cells[0]['userEnteredFormat'] = {'textFormat': {'bold': True}}
+    if time != None:
+        cells.append({'hyperlink': link, 'effectiveValue': {'stringValue': time}})
+    return {'values': cells}
+
+def generate_rta_values(scale: int = 1, seed: int = 0, with_extensions: bool = False) -> dict:
+    '''
+    Generate RTA spreadsheet rowData (in the same shape as the sheets
+    API returns it) with scale times as many stars as the real sheet,
+    including multi-strategy stars, multi-strategy 100c stars and
+    Bowser stages (with their x-cam red coin rows). With extensions, an
+    extensions sheet is generated too (see generate_rta_extension_rows).
+    '''
+    rng = random.Random(seed)
+    rows = []
+    star_count = 0
+    stage = 0
+    while star_count < BASE_STAR_COUNT * scale:
+        stage += 1
+        rows.append(get_rta_row(f'{stage}. Stage {stage}'))
+        rows.append({})
+        if stage % 5 == 0:
+            # Bowser stages have a course record, and a red coins record
+            # with [x|x]-indexed x-cam strategy rows
+            rows.append(get_rta_row(f'Stage RTA (Bowser Stage {stage})', True,
+                                    format_time(rng.uniform(120, 300)), f'https://youtu.be/rta{stage}'))
+            rows.append(get_rta_row(f'[1] Bowser Stage {stage} (Course)', True,
+                                    format_time(rng.uniform(20, 60)), f'https://youtu.be/c{stage}'))
+            rows.append(get_rta_row(f'[1] Bowser Stage {stage} Red Coins', True,
+                                    format_time(rng.uniform(40, 80)), f'https://youtu.be/r{stage}'))
+            rows.append(get_rta_row('[1|2] x-cam route', False,
+                                    format_time(rng.uniform(40, 80)), f'https://youtu.be/x{stage}'))
+            star_count += 2
+            continue
+        for star in range(7):
+            star_name = f'Stage {stage} Star {star}'
+            # The 100c star of every other stage has two routes listed
+            # as separate stars (which become strategies 1 and 2)
+            routes = [' (JP)', ' (US)'] if star == 6 and stage % 2 == 0 else ['']
+            for route in routes:
+                route_id = route.strip(' ()')
+                base_time = rng.uniform(10, 150)
+                rows.append(get_rta_row(f'[1] {star_name}{route}', True, format_time(base_time),
+                                        f'https://youtu.be/{stage}-{star}{route_id}'))
+                # Alternate strategies, some of which are faster than
+                # the first, and some with (skipped) variations
+                for strategy in range(2, rng.choice([2, 2, 3, 4, 5])):
+                    rows.append(get_rta_row(f'[{strategy}] Strategy {strategy}', False,
+                                            format_time(base_time + rng.uniform(-5, 20)),
+                                            f'https://youtu.be/{stage}-{star}{route_id}-{strategy}'))
+                    if rng.random() < 0.2:
+                        rows.append(get_rta_row(f'[{strategy}] Strategy {strategy} variation', False,
+                                                format_time(base_time + rng.uniform(0, 20)),
+                                                f'https://youtu.be/{stage}-{star}{route_id}-{strategy}v'))
+                star_count += 1
+            rows.append({})
+    if with_extensions:
+        # Two stars sharing a video, where one of the stars is the only
+        # one with a strategy labeled 'Lakitu skip'
+        stage += 1
+        rows.append(get_rta_row(f'{stage}. Stage {stage}'))
+        rows.append({})
+        rows.append(get_rta_row('[1] Check Star X', True, '30.00', 'https://youtu.be/check-shared'))
+        rows.append(get_rta_row('[1] Check Star Y', True, '30.00', 'https://youtu.be/check-y'))
+        rows.append(get_rta_row('[2] Lakitu skip', False, '31.00', 'https://youtu.be/check-shared'))
+        rows.append({})
+    rows.append(get_rta_row('[1] Last Star', True, '1.00', 'https://youtu.be/last'))
+    # Parsing stops at the castle movement rows
+    rows.append(get_rta_row('17. Castle (Lobby)'))
+    rows.append(get_rta_row('[1] Castle movement', True, '5.00', 'https://youtu.be/castle'))
+    if not with_extensions:
+        return {'sheets': [{'data': [{'rowData': rows}]}]}
+    return {'sheets': [
+        {'properties': {'title': 'Ultimate Star Spreadsheet v2'}, 'data': [{'rowData': rows}]},
+        {'properties': {'title': 'Extensions'}, 'data': [{'rowData': generate_rta_extension_rows(rows, rng)}]}
+    ]}
+
+def generate_rta_extension_rows(rows: list[dict], rng: random.Random) -> list[dict]:
+    '''
+    Generate extensions sheet rowData for a third of the stars in the
+    given RTA sheet rows. Some stars get a row with just their name
+    followed by new strategies (labeled without the star's name), some
+    get a row reusing one of their main sheet strategy's videos, and the
+    rest get a single record row labeled with their name. Some of these
+    are faster than the main sheet's records. The sheet ends with
+    blocks whose records are faster than any other, and that could be
+    mistaken for another star's: one for a star that isn't on the main
+    sheet, one reusing a video two stars share, and one for Check Star X
+    labeled like a strategy only Check Star Y has.
+    '''
+    extension_rows = []
+    for row in rows:
+        cells = row.get('values', [])
+        if len(cells) < 2 or not 'userEnteredFormat' in cells[0] or rng.random() > 1 / 3:
+            continue
+        label = cells[0]['effectiveValue']['stringValue']
+        if not label.startswith('[1]') or 'Bowser' in label:
+            continue
+        star_name = label[4:]
+        time = sum(float(part) * 60 ** i for i, part in enumerate(reversed(cells[1]['effectiveValue']['stringValue'].split(':'))))
+        kind = rng.randrange(3)
+        if kind == 0:
+            extension_rows.append({})
+            extension_rows.append(get_rta_row(star_name))
+            for strategy in range(2):
+                extension_rows.append(get_rta_row(f'[{strategy + 1}] Extension {strategy}', False,
+                                                  format_time(time + rng.uniform(-3, 10)),
+                                                  f'https://youtu.be/ext-{star_name}-{strategy}'))
+        elif kind == 1:
+            extension_rows.append(get_rta_row('[1] Retimed', False, format_time(time + rng.uniform(-3, 10)),
+                                              cells[1]['hyperlink']))
+        else:
+            extension_rows.append(get_rta_row(f'[1] {star_name}', False,
+                                              format_time(time + rng.uniform(-3, 10)),
+                                              f'https://youtu.be/ext-{star_name}'))
+    extension_rows.append({})
+    extension_rows.append(get_rta_row('Unlisted star (not on main sheet)'))
+    extension_rows.append(get_rta_row('[1] Unlisted strategy', False, UNMATCHED_EXTENSION_TIME, 'https://youtu.be/ext-unlisted'))
+    extension_rows.append({})
+    extension_rows.append(get_rta_row('[1] Retimed', False, UNMATCHED_EXTENSION_TIME, 'https://youtu.be/check-shared'))
+    extension_rows.append({})
+    extension_rows.append(get_rta_row('Check Star X'))
+    extension_rows.append(get_rta_row('[1] Lakitu skip', False, '0.02', HEADER_EXTENSION_LINK + 'Check Star X'))
+    return extension_rows
+
+def generate_ss_values(scale: int = 1, seed: int = 0) -> list[list[str]]:
+    '''
+    Generate single star spreadsheet formula values (in the same shape
+    as the sheets API returns them) with scale times as many stars as the
+    real sheet, including tied real-time records, IGT records that are
+    tied with or faster than the real-time records, and reused videos
+    '''
+    rng = random.Random(seed)
+    rows = [['Star', 'Player', 'RTA', 'IGT']]
+    links = []
+    for star in range(BASE_STAR_COUNT * scale):
+        if star % 7 == 0:
+            rows.append([])
+            rows.append([f'Stage {star // 7}'])
+        star_name = f'Bowser Stage {star} Course' if star % 35 == 34 else f'Star {star}'
+        time = rng.uniform(5, 150)
+        igt = time - rng.choice([0, 0, 0.1, 0.5])
+        # Tied real-time records only have the star name on the first row
+        for i in range(rng.choice([1, 1, 1, 2, 3])):
+            # Every so often, a video is reused for a different star
+            link = rng.choice(links) if links and rng.random() < 0.02 else f'https://youtu.be/ss{star}-{i}'
+            links.append(link)
+            rows.append([star_name if i == 0 else '', f'Player {i}',
+                         f'=HYPERLINK("{link}";"{format_ss_time(time, True)}")',
+                         format_ss_time(igt if rng.random() < 0.5 else time)])
+        for i in range(rng.choice([0, 0, 1, 1, 2])):
+            rows.append(['', 'Best IGT', '---',
+                         f'=HYPERLINK("https://youtu.be/igt{star}-{i}";"{format_ss_time(igt, True)}")'])
+    return rows
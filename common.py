@@ -1,3 +1,7 @@
+import re
+
+from functools import lru_cache, total_ordering
+
 class bcolors:
     '''Used for output coloring'''
     HEADER = '\033[95m'
@@ -16,15 +20,68 @@ def prefix_print(str: str, end: str = '\n') -> None:
     '''
     print(f'[{bcolors.OKCYAN}UWRUS{bcolors.ENDC}]: {str}', end=end)
 
-def remove_mins_place(record: str) -> float:
+@total_ordering
+class RecordTime:
+    '''
+    A record time (e.g. '1:15.10 (IGT)') stored as a whole number
+    of centiseconds plus whether it's an IGT time, so that times can
+    be compared exactly. Comparisons only look at the time itself,
+    and str() gives back the exact text the time was parsed from.
+    '''
+    __slots__ = ('centiseconds', 'is_igt', 'text')
+    TIME_PATTERN = re.compile(r'(?:(?P<mins>\d+):)?(?P<secs>\d+)(?:\.(?P<frac>\d+))?')
+
+    def __init__(self, centiseconds: int, is_igt: bool, text: str) -> None:
+        self.centiseconds: int = centiseconds
+        self.is_igt: bool      = is_igt
+        self.text: str         = text
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def parse(text: str) -> 'RecordTime':
+        '''
+        Parses a record time string (times are only
+        ever parsed once, no matter how often they're seen)
+        '''
+        match = RecordTime.TIME_PATTERN.search(text)
+        if match == None:
+            raise ValueError(f"Couldn't parse record time '{text}'")
+        mins = int(match.group('mins') or 0)
+        secs = int(match.group('secs'))
+        # Round anything more precise than centiseconds
+        frac = (match.group('frac') or '').ljust(3, '0')
+        centiseconds = (mins*60 + secs)*100 + int(frac[:2]) + (int(frac[2]) >= 5)
+        return RecordTime(centiseconds, 'IGT' in text, text)
+
+    def __eq__(self, other: 'RecordTime') -> bool:
+        return self.centiseconds == other.centiseconds
+
+    def __lt__(self, other: 'RecordTime') -> bool:
+        return self.centiseconds < other.centiseconds
+
+    def __hash__(self) -> int:
+        return hash(self.centiseconds)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f'RecordTime({self.text!r})'
+
+def get_record_keys(records: list) -> list[tuple[str, int, int]]:
     '''
-    Converts records longer than 1 minute 
-    from a X:XX.XX format to a XX.XX format
+    Returns the identity of each record as a (star name, strategy
+    index, occurrence) tuple. Star names alone don't identify stars:
+    more than one star can have the same name (e.g. 'Through the Jet
+    Stream'), and their records share a star page. occurrence tells them apart
+    by counting how many times the same name and strategy index have
+    already appeared, in sheet order.
     '''
-    record_list = record.split(':')
-    # Cast the array elements to floats
-    record_list = [float(i) for i in record_list]
-    # Convert the minutes place (record_list[0])
-    # into seconds, and add that 
-    # to the existing seconds place
-    return record_list[0]*60 + record_list[1]
\ No newline at end of file
+    keys = []
+    occurrences = {}
+    for record in records:
+        name_and_strategy = record.key()
+        occurrence = occurrences.get(name_and_strategy, 0)
+        occurrences[name_and_strategy] = occurrence + 1
+        keys.append((*name_and_strategy, occurrence))
+    return keys
\ No newline at end of file
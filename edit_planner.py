@@ -0,0 +1,88 @@
+from common import RecordTime
+from record import Record
+
+# Kinds of RTA Guide pages, which each have their own replace_record function
+NORMAL     = 'normal'
+BOWSER     = 'bowser'
+MULTI_100C = 'multi_100c'
+
+class PageEdit:
+    '''
+    Every pending record change for a single star page of a board (e.g.
+    the RTA Guide), so that the page only needs to be fetched and edited
+    once. records maps the keyword argument of the page kind's
+    replace_record function that each new record should be passed as
+    to the record itself.
+    '''
+    __slots__ = ('page_star_name', 'title', 'board', 'kind', 'records', 'rta_records', 'ss_records')
+
+    def __init__(self, page_star_name: str, title: str, board: str) -> None:
+        self.page_star_name: str       = page_star_name
+        self.title: str                = title
+        # Name of the board the page belongs to
+        self.board: str                = board
+        self.kind: str                 = NORMAL
+        self.records: dict[str, Record] = {}
+        self.rta_records: list[Record] = []
+        self.ss_records: list[Record]  = []
+
+    def get_record_types(self) -> str:
+        '''
+        Get which types of records the edit contains (for logging)
+        '''
+        return '/'.join(record_type for record_type, records in
+                        [('RTA', self.rta_records), ('SS', self.ss_records)] if records)
+
+def get_page_star_name(star_name: str) -> str:
+    '''
+    Get the name of the RTA Guide page that
+    a given record's star name belongs to
+    '''
+    # Bowser stage course and red coin records
+    # both belong to the same stage page
+    if star_name[:6] == 'Bowser':
+        if 'Course' in star_name:
+            return star_name[:-9]
+        return star_name[:-10]
+    return star_name
+
+def get_record_slot(record: Record, record_type: str) -> tuple[str, str]:
+    '''
+    Get the kind of page a record belongs to, and the replace_record
+    function keyword argument it should be passed as
+    '''
+    prefix = record_type.lower()
+    if record.star_name[:6] == 'Bowser':
+        if 'Course' in record.star_name:
+            return BOWSER, f'new_{prefix}_course_record'
+        return BOWSER, f'new_{prefix}_reds_record'
+    # Only RTA records are split by strategy on multi-strategy 100c
+    # pages, single star records go in the usual 'ss_record' spot
+    if record_type == 'RTA' and '100' in record.star_name and record.strategy in (1, 2):
+        return MULTI_100C, f'new_rta_100c_record_{record.strategy}'
+    return NORMAL, f'new_{prefix}_record'
+
+def plan_page_edits(new_rta_records: list[Record], new_ss_records: list[Record], \
+                    board: str = 'RTA Guide', title_prefix: str = 'RTA Guide/') -> list[PageEdit]:
+    '''
+    Group every new RTA and single star record by the page of a board
+    (whose titles start with title_prefix) it belongs to, and return a
+    PageEdit for each page (in the order pages first show up in the records)
+    '''
+    page_edits: dict[str, PageEdit] = {}
+    for record_type, new_records in [('RTA', new_rta_records), ('SS', new_ss_records)]:
+        for record in new_records:
+            page_star_name = get_page_star_name(record.star_name)
+            page_edit = page_edits.get(page_star_name)
+            if page_edit == None:
+                page_edit = page_edits[page_star_name] = PageEdit(page_star_name, title_prefix + page_star_name, board)
+            kind, slot = get_record_slot(record, record_type)
+            if kind != NORMAL:
+                page_edit.kind = kind
+            (page_edit.rta_records if record_type == 'RTA' else page_edit.ss_records).append(record)
+            # Stars sharing a name (see get_record_keys) all end up on
+            # the same page, so only the fastest of them can go on it
+            cur_record = page_edit.records.get(slot)
+            if cur_record == None or RecordTime.parse(record.time) < RecordTime.parse(cur_record.time):
+                page_edit.records[slot] = record
+    return list(page_edits.values())
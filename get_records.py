@@ -1,302 +1,571 @@
+from __future__ import annotations
+
+import hashlib
 import json
+import marshal
 import os
 import re
-
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.errors import HttpError
-from googleapiclient.discovery import build
-from ast import literal_eval
-
-from common import prefix_print, remove_mins_place, bcolors
-
-# Google Sheets API access scope (should be readonly)
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-
-# Single Star Spreadsheet ID and column range
-SS_SHEET = '1_cOIEnuKIQ-3LA_U0ygpiL87PTSBPlHmKDId0vC7alo'
-SS_RANGE = 'Singlestar!B:E'
-# RTA Spreadsheet ID and column range
-RTA_SHEET = '1J20aivGnvLlAuyRIMMclIFUmrkHXUzgcDmYa31gdtCI'
-RTA_RANGE = ['Ultimate Star Spreadsheet v2!A:B']
-
-# Current records lists to be saved
-RTA_RECORDS_TO_SAVE = SS_RECORDS_TO_SAVE = []
-# Records not to save (because they encountered
-# some error in the main script)
-RTA_RECORDS_NOT_TO_SAVE = SS_RECORDS_NOT_TO_SAVE = []
-
-# Note: it'd be nice to use named tuples, but given that literal_eval
-# can't parse user-defined types, the extra code required to make them
-# work with the local record files isn't worth the effort, especially 
-# considering the relatively small section of code that could actually
-# be rewritten with them.
-
+import threading
+
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+# The Google API client libraries take longer to import than a run with
+# nothing to update takes altogether, so they're only imported once needed
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+from common import prefix_print, bcolors, RecordTime
+from record import Record
+from record_store import RecordStore
+from record_diff import diff_records, ADDED, FASTER, NEW_VIDEO
+from sources import Source, RTA, RTA_RANGE
+from tracing import span
+
+# Google Sheets API access scope (should be readonly), plus Drive
+# metadata access for cheaply checking when a sheet was last modified
+# (tokens granted before it was added don't have it until the consent
+# flow is run again, so sheets are just always downloaded with them)
+SHEETS_SCOPE         = 'https://www.googleapis.com/auth/spreadsheets.readonly'
+DRIVE_METADATA_SCOPE = 'https://www.googleapis.com/auth/drive.metadata.readonly'
+SCOPES = [SHEETS_SCOPE, DRIVE_METADATA_SCOPE]
+
+# Label of the rows extension records are merged into the main sheet as
+# (an unused strategy index, so they're treated like any other strategy)
+RTA_EXTENSION_ROW_LABEL = '[9] Extensions sheet'
+
+# Fingerprints of the last fully processed state of each sheet
+FINGERPRINTS_FILE = '.\\local_records\\sheet_fingerprints.json'
+FINGERPRINTS_LOCK = threading.Lock()
+
+# Google API services (keyed by API name and version), which are
+# kept around since building one fetches the API's discovery document
+SERVICES = {}
+SERVICES_LOCK = threading.Lock()
+# Each thread's authorized HTTP transport for making requests with
+# shared services (httplib2 connections aren't thread-safe)
+THREAD_HTTP = threading.local()
+# How long before credentials expire that they get refreshed (seconds)
+CREDS_REFRESH_MARGIN = 300
+# Google API OAuth client secrets, and the access and refresh tokens they get
+CLIENT_SECRETS_FILE = '.\\sheets_api\\credentials.json'
+TOKEN_FILE          = '.\\sheets_api\\token.json'
+DRIVE_FILES_URL = 'https://www.googleapis.com/drive/v3/files/'
+
+# RTA spreadsheet rows for alternate versions
+# or routes of stars that shouldn't be parsed
+RTA_IGNORED_ROW_LABELS = frozenset([
+    'Big Penguin Race + 100c (JP)',
+    'Go on a Ghost Hunt (US)',
+    'Reds + 100c Pond spindrift early (JP)',
+    "Scary 'Shrooms, Red Coins + 100c (JP)",
+    'Reds + 100c 5 coins pole route (JP)',
+    'Reds + 100c 11 coins route (JP)'
+])
+# RTA spreadsheet rows that are named after a route or
+# version of a star rather than the star itself
+RTA_ROW_LABEL_ALIASES = {
+    'Race + 100c atmpas special route (JP)'     : 'Big Penguin Race + 100c (JP)',
+    'Reds + 100c Spawn red star late route (JP)': "Scary 'Shrooms, Red Coins + 100c (JP)",
+    'Plunder in the Sunken Ship (Normal ending)': 'Plunder in the Sunken Ship'
+}
+# Spreadsheet 100 coin star names to Ukiki 100 coin star names
+RTA_100C_STAR_NAMES = {
+    'Find the 8 Red Coins + 100c'          : 'BoB 100 Coins',
+    'Red Coins on the Floating Isle + 100c': 'WF 100 Coins',
+    'Red Coins on the Ship Afloat + 100c'  : 'JRB 100 Coins',
+    "Slip Slidin' Away + 100c"             : 'CCM 100 Coins',
+    'Big Penguin Race + 100c'              : 'CCM 100 Coins',
+    'Seek the 8 Red Coins + 100c'          : 'BBH 100 Coins',
+    'Elevate for 8 Red Coins + 100c'       : 'HMC 100 Coins',
+    'Hot-Foot-It into the Volcano + 100c'  : 'LLL 100 Coins',
+    'Pyramid Puzzle + 100c'                : 'SSL 100 Coins',
+    'Pole-Jumping for Red Coins + 100c'    : 'DDD 100 Coins',
+    "Shell Shreddin' for Red Coins + 100c" : 'SL 100 Coins',
+    'Secrets in the Shallows & Sky + 100c' : 'WDW 100 Coins',
+    'Go to Town for Red Coins + 100c'      : 'WDW 100 Coins',
+    "Scary 'Shrooms, Red Coins + 100c"     : 'TTM 100 Coins',
+    "Wiggler's Red Coins + 100c"           : 'THI 100 Coins',
+    'Stomp on the Thwomp + 100c'           : 'TTC 100 Coins',
+    'The Big House in the Sky + 100c'      : 'RR 100 Coins'
+}
+# Star names that belong to more than one star,
+# rather than multiple strategies of the same star
+RTA_NOT_MULTI_STRATEGY_STAR_NAMES = frozenset(['Through the Jet Stream'])
+# Bumped whenever a change to the parsers makes them
+# produce different records from the same rows
+PARSER_VERSION = 1
+# Hash of everything besides a sheet's rows that parsing it depends on,
+# so that block caches and sheet fingerprints saved before any of it
+# changed aren't used to skip parsing the sheet again
+PARSER_HASH = hashlib.blake2b(json.dumps([PARSER_VERSION, sorted(RTA_IGNORED_ROW_LABELS), RTA_ROW_LABEL_ALIASES,
+                                          RTA_100C_STAR_NAMES, sorted(RTA_NOT_MULTI_STRATEGY_STAR_NAMES)]).encode(),
+                              digest_size=16).hexdigest()
+
+# Local store of the last saved records for each source
+RECORD_STORE_FILE = '.\\local_records\\records.db'
+RECORD_STORE = None
+RECORD_STORE_LOCK = threading.Lock()
+
+@span('get_creds')
 def get_creds() -> Credentials:
     '''
     Retrieve Google Sheets API Credentials, or renew
     them if necessary
     '''
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
     global SCOPES
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
-    # time.
-    if os.path.exists('.\\sheets_api\\token.json'):
-        creds = Credentials.from_authorized_user_file('.\\sheets_api\\token.json', SCOPES)
+    # time. It's loaded with the scopes it was actually granted (rather than
+    # SCOPES), since refreshing it with scopes it wasn't granted fails.
+    if os.path.exists(TOKEN_FILE):
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE)
     # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
         prefix_print('Updating Google Sheets API credentials...', end='')
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                '.\\sheets_api\\credentials.json', SCOPES)
+            try:
+                creds.refresh(Request())
+            except RefreshError:
+                # The token has been revoked or has expired for
+                # good, so the user has to log in again
+                creds = None
+        if not creds or not creds.valid:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_FILE, SCOPES)
             creds = flow.run_local_server(port=0)
         # Save the credentials for the next run
-        with open('.\\sheets_api\\token.json', 'w') as token:
+        with open(TOKEN_FILE, 'w') as token:
             token.write(creds.to_json())
         print(f'{bcolors.OKGREEN}Success{bcolors.ENDC}')
     return creds
 
-def get_new_records(local_records: list[tuple[str, str, str]], \
-                    cur_records:   list[tuple[str, str, str]]) \
-                    -> list[tuple[str, str, str]]:
+def get_saved_token(margin: float = CREDS_REFRESH_MARGIN, scope: str = None) -> str | None:
+    '''
+    Get the access token saved in token.json without loading the
+    Google API client libraries (or None if there isn't one, it
+    expires within margin seconds, or it wasn't granted scope)
+    '''
+    if not os.path.exists(TOKEN_FILE):
+        return None
+    with open(TOKEN_FILE, 'r') as file:
+        saved_creds = json.load(file)
+    if not saved_creds.get('token') or not saved_creds.get('expiry'):
+        return None
+    if scope != None and not scope in saved_creds.get('scopes', []):
+        return None
+    expiry = datetime.fromisoformat(saved_creds['expiry'].replace('Z', '+00:00'))
+    if expiry.tzinfo == None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    if (expiry - datetime.now(timezone.utc)).total_seconds() <= margin:
+        return None
+    return saved_creds['token']
+
+def refresh_creds(creds: Credentials, margin: float = CREDS_REFRESH_MARGIN) -> None:
+    '''
+    Refresh credentials if they expire within margin seconds, so that
+    long-running processes never make requests with expired credentials
+    '''
+    if creds.expiry == None or not creds.refresh_token:
+        return
+    # Credentials.expiry is a naive UTC datetime
+    if (creds.expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds() > margin:
+        return
+    from google.auth.transport.requests import Request
+    prefix_print('Refreshing Google Sheets API credentials...', end='')
+    creds.refresh(Request())
+    with open(TOKEN_FILE, 'w') as token:
+        token.write(creds.to_json())
+    print(f'{bcolors.OKGREEN}Success{bcolors.ENDC}')
+
+def get_service(creds: Credentials, name: str, version: str):
+    '''
+    Get a Google API service, only building it again if the
+    credentials have changed since it was last built
+    '''
+    with SERVICES_LOCK:
+        cached_creds, service = SERVICES.get((name, version), (None, None))
+        if cached_creds is not creds:
+            from googleapiclient.discovery import build
+            # Use the discovery document bundled with the client library
+            # instead of downloading it (or caching it to file ourselves)
+            service = build(name, version, credentials=creds, static_discovery=True, cache_discovery=False)
+            SERVICES[(name, version)] = (creds, service)
+        return service
+
+def get_thread_http(creds: Credentials):
+    '''
+    Get the current thread's authorized HTTP transport, so that
+    threads can share services without sharing connections
+    '''
+    if getattr(THREAD_HTTP, 'creds', None) is not creds:
+        import google_auth_httplib2
+        import httplib2
+        THREAD_HTTP.creds = creds
+        THREAD_HTTP.http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+    return THREAD_HTTP.http
+
+def get_record_store() -> RecordStore:
+    '''
+    Open the local record store (importing the old local
+    records text files the first time it's opened)
+    '''
+    global RECORD_STORE
+    # Sources' records can be loaded at the same time
+    with RECORD_STORE_LOCK:
+        if RECORD_STORE == None:
+            RECORD_STORE = RecordStore(RECORD_STORE_FILE)
+            # The old local records files belong to the default sources
+            RECORD_STORE.import_text_file('rta', '.\\local_records\\last_saved_rta.txt')
+            RECORD_STORE.import_text_file('ss', '.\\local_records\\last_saved_ss.txt')
+        return RECORD_STORE
+
+def load_sheet_fingerprint(source_name: str) -> dict:
+    '''
+    Load the fingerprint of a source's sheet's last processed state
+    (or an empty dict if it has never been processed, or was last
+    processed by different parsers)
+    '''
+    if not os.path.exists(FINGERPRINTS_FILE):
+        return {}
+    with open(FINGERPRINTS_FILE, 'r') as file:
+        fingerprint = json.load(file).get(source_name, {})
+    if fingerprint.get('parser_hash') != PARSER_HASH:
+        return {}
+    return fingerprint
+
+def save_sheet_fingerprint(source_name: str, fingerprint: dict) -> None:
+    '''
+    Write the fingerprint of a source's sheet's last processed state to file
+    '''
+    # Sources can finish being processed at the same time
+    with FINGERPRINTS_LOCK:
+        fingerprints = {}
+        if os.path.exists(FINGERPRINTS_FILE):
+            with open(FINGERPRINTS_FILE, 'r') as file:
+                fingerprints = json.load(file)
+        fingerprints[source_name] = fingerprint
+        with open(FINGERPRINTS_FILE, 'w') as file:
+            json.dump(fingerprints, file, indent=4)
+
+def load_block_cache(path: str) -> dict:
+    '''
+    Load a sheet's block cache from the last run (or an
+    empty one if there isn't a usable one)
+    '''
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_block_cache(path: str, block_cache: dict) -> None:
+    with open(path, 'w') as file:
+        json.dump(block_cache, file)
+
+@span('probe_sheet')
+def get_sheet_modified_time(token: str, sheet_id: str) -> str | None:
+    '''
+    Get the last modified time of a sheet from the Drive API,
+    which is much cheaper than downloading the sheet itself
+    (or None if it couldn't be retrieved). Only needs an access
+    token, so that it can be used before the Google API client
+    libraries are loaded.
+    '''
+    import urllib.error
+    import urllib.request
+    request = urllib.request.Request(f'{DRIVE_FILES_URL}{sheet_id}?fields=modifiedTime',
+                                     headers={'Authorization': f'Bearer {token}'})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)['modifiedTime']
+    # Not being able to probe the sheet shouldn't stop
+    # it from being fetched, so just fall back to that
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+
+@span('check_sheets_unchanged')
+def are_sheets_unchanged(sources: list[Source]) -> bool:
+    '''
+    Check whether none of the sources' sheets have been modified since
+    they were last processed using only the saved access token, so that
+    runs with nothing to update never have to load the Google API client
+    libraries (returns False whenever that can't be told for sure)
+    '''
+    token = get_saved_token(scope=DRIVE_METADATA_SCOPE)
+    if token == None:
+        return False
+    # Sources can share a sheet (reading different ranges of it)
+    modified_times = {}
+    for source in sources:
+        if not source.sheet_id in modified_times:
+            modified_times[source.sheet_id] = get_sheet_modified_time(token, source.sheet_id)
+        modified_time = modified_times[source.sheet_id]
+        if modified_time == None or modified_time != load_sheet_fingerprint(source.name).get('modified_time'):
+            return False
+    return True
+
+@span('hash_sheet')
+def get_values_hash(values: list | dict) -> str:
+    '''
+    Hash raw spreadsheet values so that unchanged
+    sheets can be skipped before parsing
+    '''
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+@span('diff_records')
+def get_new_records(local_records: list[Record], \
+                    cur_records:   list[Record]) \
+                    -> list[Record]:
     '''
     Return only the new records as compared
     to the current local records list
     '''
-    # Remove everything from local_records except the new records
-    # (Iterate over copies of lists so that we can delete items
-    # from the actual lists while iterating)
-    local_records_cpy = local_records.copy()
-    cur_records_cpy = cur_records.copy()
-    for local_record, cur_record in zip(local_records_cpy, cur_records_cpy):
-        local_time = local_record[0]
-        cur_time = cur_record[0]
-
-        if 'IGT' in local_record[0]:
-            local_time = local_record[0][:-6]
-        if 'IGT' in cur_record[0]:
-            cur_time = cur_record[0][:-6]
-
-        if ":" in local_record[0]:
-            local_time = remove_mins_place(local_time)
-        if ":" in cur_record[0]:
-            cur_time = remove_mins_place(cur_time)
-
-        # If the wr is unchanged or the wr pulled from the sheet
-        # is slower than the local wr, then remove the record
-        if local_record == cur_record or float(cur_time) > float(local_time):
-            local_records.remove(local_record)
-            cur_records.remove(cur_record)
+    new_records = []
+    for change, local_record, cur_record in diff_records(local_records, cur_records):
+        # New stars and faster times get updated
+        if change == ADDED or change == FASTER:
+            new_records.append(cur_record)
         # If there's a new video link, then update the record
-        elif local_record[1] != cur_record[1]:
+        elif change == NEW_VIDEO:
             # There should never ever be special case
             # handling in this function! That being said...
-            if local_record[2] == 'RR 100 Coins':
-                local_records.remove(local_record)
-                cur_records.remove(cur_record)
+            if local_record.star_name == 'RR 100 Coins':
                 continue
-            cur_records[cur_records.index(cur_record)] = (local_record[0], cur_record[1], local_record[2])
-    return cur_records
+            new_records.append(Record(local_record.time, cur_record.link, local_record.star_name, local_record.strategy))
+    return new_records
 
-def parse_ss_values(values: list[str]) -> list[tuple[str, str, str]]:
+def get_ss_next_igt_rows(star_rows: list[list[str]]) -> list[int | None]:
     '''
-    Parses raw single star spreadsheet values, formats each
-    star's information (time, link, name) into tuples, and
-    returns a list containing said tuples
+    For each row of a single star spreadsheet star block (a row with
+    a star name followed by the rows without one), returns the index
+    of the next IGT record row in the block (or None if there isn't one)
+    '''
+    next_igt_rows = [None] * len(star_rows)
+    next_igt_row = None
+    # Walk back up the block, so each row only needs looking at once
+    for i in range(len(star_rows) - 1, 0, -1):
+        row = star_rows[i]
+        # This assumes every record has a real-time run... probably safe
+        if len(row) > 2 and row[1] == 'Best IGT' and row[2] == '---':
+            next_igt_row = i
+        # Rows that are too short to check can't be looked past
+        elif len(row) < 2 or (row[1] == 'Best IGT' and len(row) < 3):
+            next_igt_row = None
+        next_igt_rows[i-1] = next_igt_row
+    return next_igt_rows
+
+SS_RECORD_PARSE = re.compile(r'=HYPERLINK\("(?P<link>.+)?";"(?P<time>.+)"\)')
+# State of parse_ss_rows between rows: (IGT text for the next record,
+# name of the last star a record was added for, name of the star the
+# current row belongs to (None if there's a blank row between it and
+# its star name))
+SS_INITIAL_PARSE_STATE = ('', '', None)
+
+def parse_ss_rows(rows: list[list[str]], state: tuple, links: set[str]) \
+                  -> tuple[list[tuple[str, str, str]], tuple, dict[str, bool]]:
+    '''
+    Parses a block of raw single star spreadsheet rows, starting from
+    the state the rows before them left off at (links holds the video
+    links already in records). Returns the (time, link, star name) of
+    each record in the block, the state to continue parsing the next
+    block from, and whether each link the block checked against links
+    was already in it (which along with the rows and state determines
+    what parsing the block produces).
     '''
-    record_parse = re.compile(r'=HYPERLINK\("(?P<link>.+)?";"(?P<time>.+)"\)')
     records = []
-    IGT_TEXT = ''
-    last_star_name = ''
-    for i in range(len(values)):
-        try:
-            cur_is_igt = values[i][1] == 'Best IGT' and values[i][2] == '---'
-            rt_igt_tied = False
-
-            # Check if next row is an IGT record.
-            # If so, then skip ahead to that
-            has_igt = False
-            j = 0
-            try:
-                # Emulating a do while loop (the loop can
-                # go to the end of the current stage)
-                while values[i+j]:
-                    # This assumes every record has a real-time run... probably safe
-                    if values[i+j][1] == 'Best IGT' and values[i+j][2] == '---' and j != 0:
-                        has_igt = True
-                        break
-                    if values[i+j+1][0]:
-                        break
-                    j += 1
-            # If the next_is_igt check fails with an IndexError,
-            # then the next row is a separator row, and we should
-            # disregard this IndexError so that we don't skip over
-            # the last star row of each stage
-            except IndexError:
-                next_is_separator = True
+    # Video links in records from this block
+    block_links = set()
+    link_checks = {}
+    IGT_TEXT, last_star_name, cur_star_name = state
+
+    def parse_star_rows(star_rows: list[list[str]]) -> None:
+        nonlocal IGT_TEXT, last_star_name, cur_star_name
+        next_igt_rows = get_ss_next_igt_rows(star_rows)
+        for row, next_igt_row in zip(star_rows, next_igt_rows):
+            # Rows that start with a star name (or are blank)
+            # determine which star the following rows belong to
+            prev_star_name = cur_star_name
+            if not row:
+                cur_star_name = None
+            elif row[0]:
+                cur_star_name = row[0]
+            # Skip over rows that aren't records
+            if len(row) < 2 or (row[1] == 'Best IGT' and len(row) < 3):
+                continue
+            cur_is_igt = row[1] == 'Best IGT' and row[2] == '---'
+            has_igt = next_igt_row != None
 
+            # Only the last of multiple tied IGT records is used
             if cur_is_igt and has_igt:
                 continue
             if has_igt:
                 # Prioritize first real-time record if there are
                 # tied IGT record(s) or tied real-time record(s)
-                cur_igt = values[i][3].replace('"', '.').replace("'", ':')
+                if len(row) < 4 or len(star_rows[next_igt_row]) < 4:
+                    continue
+                cur_igt = row[3].replace('"', '.').replace("'", ':')
                 # Pretty much just to handle Snowman's Lost His Head
                 # (and maybe In the Deep Freeze)
-                try:
-                    next_igt = record_parse.search(values[i+j][3]).group('time') \
-                               .replace('""', '.').replace("'", ':')
-                except AttributeError:
-                    next_igt = values[i+1j][3].replace('"', '.').replace("'", ':')
-
-                if ':' in cur_igt:
-                    cur_igt = remove_mins_place(cur_igt)
-                if ':' in next_igt:
-                    next_igt = remove_mins_place(next_igt)
-
-                if float(cur_igt) == float(next_igt):
-                    rt_igt_tied = True
+                next_igt = SS_RECORD_PARSE.search(star_rows[next_igt_row][3])
+                if next_igt:
+                    next_igt = next_igt.group('time').replace('""', '.').replace("'", ':')
                 else:
+                    next_igt = star_rows[next_igt_row][3].replace('"', '.').replace("'", ':')
+
+                # If the real-time record isn't tied with the
+                # IGT record, then skip ahead to the IGT record
+                if RecordTime.parse(cur_igt) != RecordTime.parse(next_igt):
                     IGT_TEXT = ' (IGT)'
                     continue
-            if not has_igt or rt_igt_tied or next_is_separator:
-                res = record_parse.search(values[i][2])
-            if cur_is_igt and not rt_igt_tied:
-                res = record_parse.search(values[i][3])
 
+            if len(row) < 3 or (cur_is_igt and len(row) < 4):
+                continue
+            res = SS_RECORD_PARSE.search(row[3] if cur_is_igt else row[2])
+            # If not a time, skip over the row
+            if res == None:
+                continue
             time = res.group('time').replace('""', '.').replace("'", ':')
             link = res.group('link')
 
-            # Check if video link is already in records
-            if link not in [i[1] for i in records]:
-                if values[i][0]:
-                    star_name = values[i][0]
-                else:
-                    # Iterate back up the list
-                    # until we find the star name
-                    # (This is for stars that have
-                    # multiple tied real-time records
-                    # and/or IGT records)
-                    j = 1
-                    while not values[i-j][0]:
-                        j += 1
-                    star_name = values[i-j][0]
-
-                if star_name and star_name != last_star_name:
-                    records.append((time + IGT_TEXT, link, star_name))
-                last_star_name = star_name
-                IGT_TEXT = ''
-        # If not a time, skip over the row
-        except IndexError:
-            continue
-        except AttributeError:
-            pass
-    return records
-
-def get_ss_records(creds: Credentials = None) -> list[tuple[str, str, str]]:
+            # Check if video link is already in records (remembering
+            # what the answer was for links from earlier blocks)
+            if not link in block_links:
+                link_checks[link] = link in links
+            if link in block_links or link_checks[link]:
+                continue
+            # Stars that have multiple tied real-time records
+            # and/or IGT records only have their name on the first row
+            star_name = row[0] if row[0] else prev_star_name
+            if star_name == None:
+                continue
+            if star_name != last_star_name:
+                records.append((time + IGT_TEXT, link, star_name))
+                block_links.add(link)
+            last_star_name = star_name
+            IGT_TEXT = ''
+
+    # Group rows by star (a row with a star name or a blank row, and
+    # all the rows after it without a star name) so that looking
+    # ahead for IGT records never has to go past the current star
+    star_rows = []
+    for row in rows:
+        if star_rows and (not row or row[0]):
+            parse_star_rows(star_rows)
+            star_rows = []
+        star_rows.append(row)
+    if star_rows:
+        parse_star_rows(star_rows)
+    return records, (IGT_TEXT, last_star_name, cur_star_name), link_checks
+
+def get_ss_row_blocks(values: list[list[str]]) -> list[list[list[str]]]:
     '''
-    Gets new Single Star WRs from spreadsheet and creates
-    a list of tuples that hold the new times, links, and
-    star names
+    Splits raw single star spreadsheet rows into blocks at
+    each blank row (which separate the sheet's stages)
     '''
-    global SS_SHEET, SS_RANGE, SS_RECORDS_TO_SAVE, SS_RECORDS_NOT_TO_SAVE
-    try:
-        if creds:
-            service = build('sheets', 'v4', credentials=creds)
-            sheet = service.spreadsheets()
-            # For each row in the specified column range, get the cell formula
-            result = sheet.values().get(spreadsheetId=SS_SHEET,
-                     range=SS_RANGE, valueRenderOption='FORMULA').execute()
-            values = result.get('values', [])
-
-            if not values:
-                print('No data found in sheet')
-                return
-
-        # Read locally stored records
-        local_records = []
-        with open('.\\local_records\\last_saved_ss.txt', 'r') as file:
-            for line in file:
-                local_records.append(literal_eval(line.strip('\n')))
-        if creds:
-            # Parse records pulled from spreadsheet
-            cur_records = parse_ss_values(values)
-        elif creds == 'DEBUG':
-            # For Debug / Testing
-            cur_records = []
-            with open('.\\test_pages\\test_ss_raw.txt', 'r') as file:
-                for line in file:
-                    cur_records.append(line)
-            cur_records = parse_ss_values(cur_records)
+    blocks = [[]]
+    for row in values:
+        if not row and blocks[-1]:
+            blocks.append([])
+        blocks[-1].append(row)
+    return blocks
+
+@span('parse_ss_values')
+def parse_ss_values(values: list[list[str]], block_cache: dict = None) -> list[Record]:
+    '''
+    Parses raw single star spreadsheet values, formats each
+    star's information (time, link, name) into Records, and
+    returns a list containing said Records. If a block cache
+    (from a previous parse) is given, only the stage blocks
+    that have changed since then are parsed again, and the
+    cache is updated to hold just this parse's blocks.
+    '''
+    records = []
+    # Video links already in records
+    links = set()
+    state = SS_INITIAL_PARSE_STATE
+    used_block_cache = {}
+    for block in get_ss_row_blocks(values):
+        block_hash = None
+        cached_block = None
+        if block_cache != None:
+            block_hash = get_block_hash(block, state)
+            cached_block = block_cache.get(block_hash)
+            # Blocks can only be reused if every link they checked
+            # is (or isn't) already in records like it was before
+            if cached_block and any((link in links) != was_in_links for link, was_in_links in cached_block[2].items()):
+                cached_block = None
+        if cached_block == None:
+            cached_block = parse_ss_rows(block, state, links)
+        block_records, state, _ = cached_block
+        if block_hash != None:
+            used_block_cache[block_hash] = cached_block
+        records += block_records
+        links.update(record[1] for record in block_records)
+    if block_cache != None:
+        block_cache.clear()
+        block_cache.update(used_block_cache)
+    return [Record(*record) for record in records]
+
+def normalize_rta_star_name(row_label: str) -> str | None:
+    '''
+    Converts an RTA spreadsheet row label (minus its strategy index)
+    to the star's name on Ukikipedia (or None if the row should be
+    ignored)
+    '''
+    if row_label in RTA_IGNORED_ROW_LABELS:
+        return None
+    star_name = RTA_ROW_LABEL_ALIASES.get(row_label, row_label)
+    if '(No log firsty)' in star_name:
+        star_name = star_name[:-16]
+
+    # Remove 'JP' or 'US' from star name
+    if 'JP' in star_name or 'US' in star_name:
+        # Special case handling...
+        if star_name[:11] == 'BitS Battle':
+            star_name = star_name[:-20]
         else:
-            return
+            star_name = star_name[:-5]
 
-        # Save records if it's the first time running
-        # or if the file somehow gets deleted
-        if not os.path.exists('.\\local_records\\last_saved_ss.txt'):
-            save_ss_records()
+    # Doing this here so that the names of the RTA and 
+    # single star sheet row labels are the same for
+    # Bowser course records, which makes life easier
+    # in the main script when parsing record names
+    if 'Course' in star_name:
+        star_name = star_name.replace('(', '').replace(')', '')
 
-    except HttpError as err:
-        prefix_print(f'{bcolors.FAIL}Google Sheets API Error:{bcolors.ENDC} {err}')
-        return
+    # Converting from spreadsheet 100 coin naming scheme
+    # to Ukiki 100 coin naming scheme
+    return RTA_100C_STAR_NAMES.get(star_name, star_name)
 
-    new_records = get_new_records(local_records, cur_records)
-    # Set RECORDS_TO_SAVE, and
-    # reset RECORDS_NOT_TO_SAVE
-    SS_RECORDS_TO_SAVE = cur_records.copy()
-    SS_RECORDS_NOT_TO_SAVE = []
-    return new_records
-
-def set_ss_record_not_to_save(record: tuple[str, str, str]) -> None:
-    '''
-    Mark a single star record not to be saved to local file
-    '''
-    global SS_RECORDS_NOT_TO_SAVE
-    SS_RECORDS_NOT_TO_SAVE.append(record)
+# State of parse_rta_rows between rows: (best row of the current star,
+# current star's name, number of strategies seen for the current star,
+# previous row's strategy index)
+RTA_INITIAL_PARSE_STATE = ((f"{float('inf')}", '', ''), '', 0, '0')
 
-def save_ss_records() -> None:
+def parse_rta_rows(rows: list[dict], state: tuple) -> tuple[list[tuple[str, str, str | None]], tuple, bool]:
     '''
-    Write current single star records to local file
-    (minus records set not to save)
-    '''
-    global SS_RECORDS_TO_SAVE, SS_RECORDS_NOT_TO_SAVE
-    if SS_RECORDS_TO_SAVE:
-        records_to_save = [i for i in SS_RECORDS_TO_SAVE if i not in SS_RECORDS_NOT_TO_SAVE]
-        local_records = []
-        with open('.\\local_records\\last_saved_ss.txt', 'w+') as file:
-            # Load local records into list
-            for line in file:
-                local_records.append(literal_eval(line.strip('\n')))
-            # "Find and replace" local records with new records
-            for i, local_record in enumerate(local_records):
-                for new_record in records_to_save:
-                    if new_record[2] == local_record[2]:
-                        local_records[i] = new_record
-            # Write updated local records to file
-            file.seek(0)
-            for record in records_to_save:
-                file.write(str(record)+'\n')
-
-def parse_rta_values(values: dict) -> list[tuple[str, str, str]]:
-    '''
-    Parses raw RTA spreadsheet values, formats each
-    star's information (time, link, name) into tuples, and
-    returns a list containing said tuples
+    Parses a block of raw RTA spreadsheet rows, starting from the state
+    the rows before them left off at. Returns the (time, link, normalized
+    star name) of each star finished in the block, the state to continue
+    parsing the next block from, and whether the end of the stars was reached.
     '''
     row_label_parse = re.compile(r'\[(?P<strategy_index>\d)\]')
     records = []
 
-    prev_row = (f"{float('inf')}", '', '') # placeholder values
-    cur_star_name = ''
-    cur_star_strategy_count = 0
-    prev_strategy_index = '0'
-    best_star_time = float('inf') # placeholder value
+    prev_row, cur_star_name, cur_star_strategy_count, prev_strategy_index = state
+    # The best row so far is always prev_row (and its time is
+    # the best time) while the current star has strategies
+    cur_row = prev_row
+    best_star_time = RecordTime.parse(prev_row[0]) if cur_star_strategy_count else None
     # Interating over rows in spreadsheet
-    for i in values['sheets'][0]['data'][0]['rowData']:
+    for i in rows:
         # If there is a time in the row...
         if i and len(i['values']) > 1:
             # And a link...
@@ -307,7 +576,8 @@ def parse_rta_values(values: dict) -> list[tuple[str, str, str]]:
                 # set as cur_row (which prev_row is set to), append
                 # the row to records and reset cur_star_strategy_count
                 if is_bold and cur_star_strategy_count >= 1:
-                    records.append(prev_row)
+                    # Remove the [1] from the star name
+                    records.append((prev_row[0], prev_row[1], normalize_rta_star_name(prev_row[2][4:])))
                     cur_star_strategy_count = 0
                 
                 row_label = i['values'][0]['effectiveValue']['stringValue']
@@ -348,13 +618,10 @@ def parse_rta_values(values: dict) -> list[tuple[str, str, str]]:
                 # a faster time is parsed, or if this is the first
                 # iteration
                 time = i['values'][1]['effectiveValue']['stringValue']
-                if ':' in time:
-                    time_f = remove_mins_place(time)
-                else:
-                    time_f = float(time)
-                if time_f < best_star_time or cur_star_strategy_count == 0:
+                record_time = RecordTime.parse(time)
+                if cur_star_strategy_count == 0 or record_time < best_star_time:
                     cur_row = ((time, i['values'][1]['hyperlink'], cur_star_name))
-                    best_star_time = time_f
+                    best_star_time = record_time
 
                 prev_strategy_index = strategy_index
                 prev_row = cur_row
@@ -362,206 +629,383 @@ def parse_rta_values(values: dict) -> list[tuple[str, str, str]]:
         # Don't track castle movement rows (idk why the logic has to be weird like this)
         elif i and 'effectiveValue' in i['values'][0]:
             if i['values'][0]['effectiveValue']['stringValue'] == '17. Castle (Lobby)':
-                break
-
-    for i in range(len(records)-6): # -6 because we are going to remove 6 entries
-        # Remove the [1] from the star name
-        cur_star_name = records[i][2][4:]
-
-        # Special case handling (worst design of all time award)...
-        if cur_star_name == 'Big Penguin Race + 100c (JP)':
-            records.remove(records[i])
-        elif cur_star_name == 'Race + 100c atmpas special route (JP)':
-            cur_star_name = 'Big Penguin Race + 100c (JP)'
-        elif '(No log firsty)' in cur_star_name:
-            cur_star_name = cur_star_name[:-16]
-        elif cur_star_name == 'Go on a Ghost Hunt (US)' \
-             or cur_star_name == 'Reds + 100c Pond spindrift early (JP)' \
-             or cur_star_name == "Scary 'Shrooms, Red Coins + 100c (JP)" \
-             or cur_star_name == 'Reds + 100c 5 coins pole route (JP)':
-            records.remove(records[i])
-            # Removing a record essentially increments
-            # i by 1, so we have to reset cur_star_name
-            cur_star_name = records[i][2][4:]
-        if cur_star_name == 'Reds + 100c Spawn red star late route (JP)':
-            cur_star_name = "Scary 'Shrooms, Red Coins + 100c (JP)"
-        elif cur_star_name == 'Reds + 100c 11 coins route (JP)':
-            # Doing this again because reasons...
-            records.remove(records[i])
-            cur_star_name = records[i][2][4:]
-        
-        # Plunder in the Sunken Ship special case handling...
-        if cur_star_name == 'Plunder in the Sunken Ship (Normal ending)':
-            cur_star_name = cur_star_name.replace(' (Normal ending)', '')
-
-        # Remove 'JP' or 'US' from star name
-        if 'JP' in cur_star_name or 'US' in cur_star_name:
-            # Special case handling...
-            if cur_star_name[:11] == 'BitS Battle':
-                cur_star_name = cur_star_name[:-20]
-            else:
-                cur_star_name = cur_star_name[:-5]
-
-        # Doing this here so that the names of the RTA and 
-        # single star sheet row labels are the same for
-        # Bowser course records, which makes life easier
-        # in the main script when parsing record names
-        if 'Course' in cur_star_name:
-            cur_star_name = cur_star_name.replace('(', '').replace(')', '')
-
-        # Converting from spreadsheet 100 coin naming scheme
-        # to Ukiki 100 coin naming scheme
-        if '100c' in cur_star_name:
-            match(cur_star_name):
-                case 'Find the 8 Red Coins + 100c':
-                    cur_star_name = 'BoB 100 Coins'
-                case 'Red Coins on the Floating Isle + 100c':
-                    cur_star_name = 'WF 100 Coins'
-                case 'Red Coins on the Ship Afloat + 100c':
-                    cur_star_name = 'JRB 100 Coins'
-                case "Slip Slidin' Away + 100c" | 'Big Penguin Race + 100c':
-                    cur_star_name = 'CCM 100 Coins'
-                case 'Seek the 8 Red Coins + 100c':
-                    cur_star_name = 'BBH 100 Coins'
-                case 'Elevate for 8 Red Coins + 100c':
-                    cur_star_name = 'HMC 100 Coins'
-                case 'Hot-Foot-It into the Volcano + 100c':
-                    cur_star_name = 'LLL 100 Coins'
-                case 'Pyramid Puzzle + 100c':
-                    cur_star_name = 'SSL 100 Coins'
-                case 'Pole-Jumping for Red Coins + 100c':
-                    cur_star_name = 'DDD 100 Coins'
-                case "Shell Shreddin' for Red Coins + 100c":
-                    cur_star_name = 'SL 100 Coins'
-                case 'Secrets in the Shallows & Sky + 100c' | 'Go to Town for Red Coins + 100c':
-                    cur_star_name = 'WDW 100 Coins'
-                case "Scary 'Shrooms, Red Coins + 100c":
-                    cur_star_name = 'TTM 100 Coins'
-                case "Wiggler's Red Coins + 100c":
-                    cur_star_name = 'THI 100 Coins'
-                case 'Stomp on the Thwomp + 100c':
-                    cur_star_name = 'TTC 100 Coins'
-                case 'The Big House in the Sky + 100c':
-                    cur_star_name = 'RR 100 Coins'
-
-        # If cur_star_name is already in records, append a 1 and a 2 to the
-        # end of the tuples of the respective records (this is to distinguish
-        # between multi-strategy 100c stars)
-        for j, record in enumerate(records):
-            # Special case handling...
-            if record[2] == cur_star_name and cur_star_name != 'Through the Jet Stream':
-                records[j] = (record[0], record[1], record[2], 1)
-        if cur_star_name in [j[2] for j in records] and cur_star_name != 'Through the Jet Stream':
-            parsed_record = (records[i][0], records[i][1], cur_star_name, 2)
-        else:
-            parsed_record = (records[i][0], records[i][1], cur_star_name)
-        records[i] = parsed_record
+                return records, (prev_row, cur_star_name, cur_star_strategy_count, prev_strategy_index), True
 
-    return records
+    return records, (prev_row, cur_star_name, cur_star_strategy_count, prev_strategy_index), False
 
-def get_rta_records(creds: Credentials = None) -> list[tuple[str, str, str]]:
+def get_rta_row_label(row: dict) -> str | None:
+    if not row or not 'effectiveValue' in row['values'][0]:
+        return None
+    return row['values'][0]['effectiveValue'].get('stringValue')
+
+def get_rta_row_record(row: dict) -> tuple[str, str] | None:
     '''
-    Gets new RTA WRs from spreadsheet and creates
-    a list of tuples that hold the new times, links, and
-    row labels
+    Get the time and link of an RTA spreadsheet
+    row (if it has a linked time)
     '''
-    global RTA_SHEET, RTA_RANGE, RTA_RECORDS_TO_SAVE, RTA_RECORDS_NOT_TO_SAVE
-    try:
-        # TODO: have to get extensions sheet data as well...
-        # otherwise faster times that exist on there will
-        # never be updated unless someone updates it
-        # manually, which the avoidance of is the whole
-        # purpose of this program...
-        # the algorithm for syncing the extensions sheet
-        # rows with the main sheet's rows can't just look
-        # at star names either, because some rows are just
-        # named by strategy, with no mention of star name :|
-
-        if creds:
-            service = build('sheets', 'v4', credentials=creds)
-            sheet = service.spreadsheets()
-            # For each row in the specified column range, get the following attributes: (boldness, hyperlink, displayed text)
-            result = sheet.get(spreadsheetId=RTA_SHEET,
-                     ranges=RTA_RANGE,
-                     fields='sheets/data/rowData/values(userEnteredFormat/textFormat/bold,hyperlink,effectiveValue/stringValue)').execute() # monstrosity
-
-            if not result:
-                print('No data found in sheet')
-                return
-
-        # Read locally stored records
-        local_records = []
-        with open('.\\local_records\\last_saved_rta.txt', 'r') as file:
-            for line in file:
-                local_records.append(literal_eval(line.strip('\n')))
-        if creds:
-            # Parse records pulled from spreadsheet
-            cur_records = parse_rta_values(result)
-        elif creds == 'DEBUG':
-            # For Debug / Testing
-            json_test_wrs = {}
-            with open('.\\test_pages\\j2.json', 'r') as file:
-                json_test_wrs = json.load(file)
-                cur_records = parse_rta_values(json_test_wrs)
+    if not row or len(row['values']) < 2 or not 'hyperlink' in row['values'][1] \
+       or not 'stringValue' in row['values'][1].get('effectiveValue', {}):
+        return None
+    return row['values'][1]['effectiveValue']['stringValue'], row['values'][1]['hyperlink']
+
+def strip_rta_strategy_index(row_label: str) -> str:
+    '''
+    Remove the [x] (or [x|x]) from the start of a row label
+    '''
+    if row_label.startswith('['):
+        row_label = row_label[row_label.find(']') + 1:]
+    return row_label.strip()
+
+def merge_rta_extension_rows(rows: list[dict], extension_rows: list[dict]) -> list[dict]:
+    '''
+    Merge the fastest extensions sheet record for each star into the main
+    sheet's rows as an extra strategy row at the end of the star's rows,
+    so that parsing picks it if it's faster than the main sheet's records.
+
+    Extension rows in a block whose header row names one of the main
+    sheet's stars belong to that star, and rows in a block whose header
+    names anything else are left out. Rows in blocks without a header
+    are matched to stars by star name (for rows labeled with just the
+    star's name), then by video link, then by strategy label, each only
+    if exactly one star matches. Rows that don't match a star are left
+    out, rather than risking putting a time on the wrong star's page.
+    Each match is a lookup in an index built in one pass over the main
+    sheet, so merging takes time linear in the total number of rows.
+    '''
+    # Main sheet indexes from star name, video link and strategy label to
+    # the index of the star's [1] row (or None if more than one star matches)
+    star_names = {}
+    links = {}
+    strategy_labels = {}
+    # Index of the row each star's rows end before
+    star_ends = {}
+    cur_star = None
+    for i, row in enumerate(rows):
+        if not row:
+            continue
+        record = get_rta_row_record(row)
+        is_bold = record != None and 'userEnteredFormat' in row['values'][0]
+        # Stage headers, and rows for the next star (or a Stage RTA)
+        if len(row['values']) == 1 or is_bold:
+            if cur_star != None:
+                star_ends[cur_star] = i
+            cur_star = None
+        if record == None:
+            continue
+        row_label = get_rta_row_label(row)
+        if row_label == None:
+            continue
+        strategy_label = strip_rta_strategy_index(row_label)
+        if is_bold and row_label.startswith('[1]'):
+            cur_star = i
+            star_names[strategy_label] = None if strategy_label in star_names else i
+        if cur_star == None:
+            continue
+        links[record[1]] = cur_star if links.get(record[1], cur_star) == cur_star else None
+        strategy_labels[strategy_label] = cur_star if strategy_labels.get(strategy_label, cur_star) == cur_star else None
+    if cur_star != None:
+        star_ends[cur_star] = len(rows)
+
+    # Fastest extension record for each star, keyed by the star's [1] row
+    best_records = {}
+    # Header row label of the current block of rows (None if it doesn't
+    # have one), and the star it names (None if it isn't exactly one of
+    # the main sheet's stars)
+    header_label = None
+    header_star = None
+    for row in extension_rows:
+        row_label = get_rta_row_label(row)
+        record = get_rta_row_record(row)
+        # Blank rows and header rows start a new block
+        if row_label == None or record == None:
+            header_label = row_label
+            header_star = star_names.get(strip_rta_strategy_index(row_label)) if row_label != None else None
+            continue
+        strategy_label = strip_rta_strategy_index(row_label)
+        # A block's header decides which star its rows are for, even
+        # if their links or labels look like another star's
+        if header_label != None:
+            cur_star = header_star
+        elif star_names.get(strategy_label) != None:
+            cur_star = star_names[strategy_label]
+        elif links.get(record[1]) != None:
+            cur_star = links[record[1]]
         else:
-            return
+            cur_star = strategy_labels.get(strategy_label)
+        if cur_star == None:
+            continue
+        try:
+            record_time = RecordTime.parse(record[0])
+        except ValueError:
+            continue
+        if not cur_star in best_records or record_time < best_records[cur_star][0]:
+            best_records[cur_star] = (record_time, record)
+
+    # Splice the extension rows in at the end of each star's rows
+    merged_rows = []
+    prev_star_end = 0
+    for star in sorted(best_records, key=lambda star: star_ends[star]):
+        time, link = best_records[star][1]
+        merged_rows += rows[prev_star_end:star_ends[star]]
+        merged_rows.append({'values': [
+            {'effectiveValue': {'stringValue': RTA_EXTENSION_ROW_LABEL}},
+            {'hyperlink': link, 'effectiveValue': {'stringValue': time}}
+        ]})
+        prev_star_end = star_ends[star]
+    merged_rows += rows[prev_star_end:]
+    return merged_rows
+
+def get_rta_sheet_rows(values: dict, sheet_title: str) -> list[dict] | None:
+    '''
+    Get the rows of one of the sheets in raw RTA spreadsheet values
+    (which come back in the spreadsheet's tab order, rather than
+    the order they were asked for in)
+    '''
+    for sheet in values['sheets']:
+        if sheet.get('properties', {}).get('title') == sheet_title:
+            return sheet['data'][0].get('rowData', [])
+    return None
 
-        # Save records if it's the first time running
-        # or if the file somehow gets deleted
-        if not os.path.exists('.\\local_records\\last_saved_rta.txt'):
-            save_rta_records()
+def get_rta_row_blocks(rows: list[dict]) -> list[list[dict]]:
+    '''
+    Splits raw RTA spreadsheet rows into blocks at each stage
+    header row (a row with just a label, e.g. '1. Bob-omb Battlefield')
+    '''
+    blocks = [[]]
+    for row in rows:
+        if row and len(row['values']) == 1 and blocks[-1]:
+            blocks.append([])
+        blocks[-1].append(row)
+    return blocks
+
+def get_block_hash(block: list, state) -> str:
+    '''
+    Hash a block of raw spreadsheet rows along with the parser
+    state it starts from (and the parsers themselves), which
+    together determine what parsing the block will produce
+    '''
+    block_hash = hashlib.blake2b(PARSER_HASH.encode(), digest_size=16)
+    block_hash.update(json.dumps(state).encode())
+    # Marshal is a lot faster than JSON for the (much bigger) rows, and
+    # version 2 doesn't share references between equal objects, so
+    # equal rows are always serialized the same way
+    block_hash.update(marshal.dumps(block, 2))
+    return block_hash.hexdigest()
+
+@span('parse_rta_values')
+def parse_rta_values(values: dict, block_cache: dict = None, ranges: list[str] = None) -> list[Record]:
+    '''
+    Parses raw RTA spreadsheet values, formats each
+    star's information (time, link, name) into Records, and
+    returns a list containing said Records. If a block cache
+    (from a previous parse) is given, only the stage blocks
+    that have changed since then are parsed again, and the
+    cache is updated to hold just this parse's blocks.
+    ranges are the ranges the values were fetched from (the
+    main sheet's, then optionally the extensions sheet's).
+    '''
+    if ranges == None:
+        ranges = RTA_RANGE
+    # Values saved without sheet titles (e.g. for debugging)
+    # only have the main sheet
+    rows = get_rta_sheet_rows(values, ranges[0].split('!')[0])
+    if rows == None:
+        rows = values['sheets'][0]['data'][0]['rowData']
+    extension_rows = None
+    if len(ranges) > 1:
+        extension_rows = get_rta_sheet_rows(values, ranges[1].split('!')[0])
+    if extension_rows:
+        with span('merge_extension_rows'):
+            rows = merge_rta_extension_rows(rows, extension_rows)
+
+    star_records = []
+    state = RTA_INITIAL_PARSE_STATE
+    used_block_cache = {}
+    for block in get_rta_row_blocks(rows):
+        if block_cache == None:
+            block_records, state, is_done = parse_rta_rows(block, state)
+        else:
+            block_hash = get_block_hash(block, state)
+            cached_block = block_cache.get(block_hash)
+            if cached_block == None:
+                cached_block = parse_rta_rows(block, state)
+            block_records, state, is_done = used_block_cache[block_hash] = cached_block
+        star_records += block_records
+        if is_done:
+            break
+    if block_cache != None:
+        block_cache.clear()
+        block_cache.update(used_block_cache)
+
+    # If a star name is already in records, set the strategy of the
+    # respective records to 1 and 2 (this is to distinguish between
+    # multi-strategy 100c stars)
+    parsed_records = []
+    star_name_indices = {}
+    for time, link, cur_star_name in star_records:
+        if cur_star_name == None:
+            continue
+        indices = star_name_indices.setdefault(cur_star_name, [])
+        if indices and cur_star_name not in RTA_NOT_MULTI_STRATEGY_STAR_NAMES:
+            for j in indices:
+                parsed_records[j] = Record(parsed_records[j].time, parsed_records[j].link, cur_star_name, 1)
+            parsed_records.append(Record(time, link, cur_star_name, 2))
+        else:
+            parsed_records.append(Record(time, link, cur_star_name))
+        indices.append(len(parsed_records) - 1)
 
-    except HttpError as err:
-        prefix_print(f'{bcolors.FAIL}Google Sheets API Error:{bcolors.ENDC} {err}')
-        return
+    return parsed_records
 
-    new_records = get_new_records(local_records, cur_records)
-    # Set RECORDS_TO_SAVE, and
-    # reset RECORDS_NOT_TO_SAVE
-    RTA_RECORDS_TO_SAVE = cur_records.copy()
-    RTA_RECORDS_NOT_TO_SAVE = []
-    return new_records
+class SourceRecords:
+    '''
+    Everything a source's worker reads on a run: the source's new
+    records, along with what to save once they've been updated (its
+    current records, and the fingerprint of the sheet they came from,
+    which is only saved once all of them have been, since otherwise
+    records that failed to update would be skipped over on the next run)
+    '''
+    __slots__ = ('source', 'new_records', 'records_to_save', 'records_not_to_save', 'pending_fingerprint')
+
+    def __init__(self, source: Source, new_records: list[Record], records_to_save: list[Record], \
+                 pending_fingerprint: dict = None) -> None:
+        self.source: Source              = source
+        self.new_records: list[Record]   = new_records
+        self.records_to_save: list[Record] = records_to_save
+        # Records not to save (because they encountered
+        # some error in the main script)
+        self.records_not_to_save: list[Record] = []
+        self.pending_fingerprint: dict   = pending_fingerprint
+
+    def set_record_not_to_save(self, record: Record) -> None:
+        '''
+        Mark a record not to be saved to the local record store
+        '''
+        self.records_not_to_save.append(record)
+
+def get_sheet_values(creds: Credentials, source: Source) -> list | dict:
+    '''
+    Download a source's raw spreadsheet values
+    '''
+    from googleapiclient.errors import HttpError
+    service = get_service(creds, 'sheets', 'v4')
+    sheet = service.spreadsheets()
+    if source.kind == RTA:
+        # For each row in the specified column ranges (of the main sheet and any
+        # extensions sheet), get the following attributes: (boldness, hyperlink, displayed text)
+        fields = 'sheets/properties/title,sheets/data/rowData/values(userEnteredFormat/textFormat/bold,hyperlink,effectiveValue/stringValue)' # monstrosity
+        try:
+            return sheet.get(spreadsheetId=source.sheet_id, ranges=source.ranges,
+                             fields=fields).execute(http=get_thread_http(creds))
+        except HttpError as err:
+            # A range of a tab that doesn't exist fails the whole request, but
+            # a missing extensions sheet shouldn't stop the main sheet being read
+            if err.resp.status != 400 or len(source.ranges) < 2:
+                raise
+            prefix_print(f"{bcolors.WARNING}Warning{bcolors.ENDC}: Couldn't read {source.label} extensions sheet "
+                         f'({source.ranges[1]}), reading the main sheet only...')
+            return sheet.get(spreadsheetId=source.sheet_id, ranges=source.ranges[:1],
+                             fields=fields).execute(http=get_thread_http(creds))
+    # For each row in the specified column range, get the cell formula
+    result = sheet.values().get(spreadsheetId=source.sheet_id,
+             range=source.ranges[0], valueRenderOption='FORMULA').execute(http=get_thread_http(creds))
+    return result.get('values', [])
+
+def parse_source_values(source: Source, values: list | dict, block_cache: dict = None) -> list[Record]:
+    '''
+    Parse a source's raw spreadsheet values with its kind's parser
+    '''
+    if source.kind == RTA:
+        return parse_rta_values(values, block_cache, source.ranges)
+    return parse_ss_values(values, block_cache)
 
-def set_rta_record_not_to_save(record: tuple[str, str, str]) -> None:
+def get_source_records(source: Source, creds: Credentials = None) -> SourceRecords | None:
     '''
-    Mark an RTA record not to be saved to local file
+    Gets new WRs from a source's spreadsheet as Records that hold
+    the new times, links, and star names (or None if the sheet
+    couldn't be read). Only uses its arguments and files of its
+    own, so sources can be read in separate processes.
     '''
-    global RTA_RECORDS_NOT_TO_SAVE
-    RTA_RECORDS_NOT_TO_SAVE.append(record)
+    from googleapiclient.errors import HttpError
+    with span('get_source_records', source=source.name):
+        pending_fingerprint = None
+        try:
+            if creds and creds != 'DEBUG':
+                # Skip the full fetch if the sheet hasn't been modified since
+                # it was last processed (which takes the Drive metadata scope)
+                fingerprint = load_sheet_fingerprint(source.name)
+                modified_time = None
+                if creds.has_scopes([DRIVE_METADATA_SCOPE]):
+                    modified_time = get_sheet_modified_time(creds.token, source.sheet_id)
+                if modified_time and modified_time == fingerprint.get('modified_time'):
+                    prefix_print(f'Skipping {source.label} spreadsheet (unchanged since last run)...')
+                    return SourceRecords(source, [], [])
+
+                with span('download_sheet'):
+                    values = get_sheet_values(creds, source)
+
+                if not values:
+                    print('No data found in sheet')
+                    return None
+
+                # Skip parsing if the sheet was modified, but not in the range
+                # we care about (e.g. formatting changes or other tabs being edited)
+                pending_fingerprint = {'modified_time': modified_time, 'content_hash': get_values_hash(values),
+                                       'parser_hash': PARSER_HASH}
+                if pending_fingerprint['content_hash'] == fingerprint.get('content_hash'):
+                    prefix_print(f'Skipping {source.label} spreadsheet (records unchanged since last run)...')
+                    return SourceRecords(source, [], [], pending_fingerprint)
+
+            # Read locally stored records
+            with span('load_local_records'):
+                local_records = get_record_store().load(source.name)
+            # 'DEBUG' is truthy, so it has to be checked first
+            if creds == 'DEBUG':
+                # For Debug / Testing
+                with open(source.debug_file, 'r') as file:
+                    cur_records = parse_source_values(source, json.load(file))
+            elif creds:
+                # Parse records pulled from spreadsheet, reusing the
+                # last run's parses of rows that haven't changed
+                block_cache = load_block_cache(source.get_block_cache_file())
+                cur_records = parse_source_values(source, values, block_cache)
+                save_block_cache(source.get_block_cache_file(), block_cache)
+            else:
+                return None
+
+        except HttpError as err:
+            prefix_print(f'{bcolors.FAIL}Google Sheets API Error:{bcolors.ENDC} {err}')
+            return None
+
+        new_records = get_new_records(local_records, cur_records)
+        return SourceRecords(source, new_records, cur_records, pending_fingerprint)
 
-def save_rta_records() -> None:
+def save_source_records(source_records: SourceRecords) -> None:
     '''
-    Write current RTA records to local file
+    Write a source's current records to the local record store
     (minus records set not to save)
     '''
-    global RTA_RECORDS_TO_SAVE, RTA_RECORDS_NOT_TO_SAVE
-    if RTA_RECORDS_TO_SAVE:
-        records_to_save = [i for i in RTA_RECORDS_TO_SAVE if i not in RTA_RECORDS_NOT_TO_SAVE]
-        local_records = []
-        with open('.\\local_records\\last_saved_rta.txt', 'r+') as file:
-            # Load local records into list
-            for line in file:
-                local_records.append(literal_eval(line.strip('\n')))
-            # "Find and replace" local records with new records
-            for i, local_record in enumerate(local_records):
-                for new_record in records_to_save:
-                    if new_record[2] == local_record[2]:
-                        local_records[i] = new_record
-            # Write updated local records to file
-            file.seek(0)
-            for record in local_records:
-                file.write(str(record)+'\n')
+    with span('save_source_records', source=source_records.source.name):
+        if source_records.records_to_save:
+            # Records not to save are matched by star name and strategy index,
+            # since the record that failed to update may have a different
+            # time or link than its counterpart in records_to_save
+            keys_not_to_save = {record.key() for record in source_records.records_not_to_save}
+            skip_positions = {i for i, record in enumerate(source_records.records_to_save)
+                              if record.key() in keys_not_to_save}
+            # Only rows that actually changed get written
+            get_record_store().upsert(source_records.source.name, source_records.records_to_save, skip_positions)
+        # Only mark the sheet as processed if every record was updated
+        if source_records.pending_fingerprint and not source_records.records_not_to_save:
+            save_sheet_fingerprint(source_records.source.name, source_records.pending_fingerprint)
 
 # Test Driver Code
 if __name__ == '__main__':
+    from sources import load_boards, get_board_sources
     CREDS = get_creds()
-    new_records = get_rta_records(CREDS)
-    save_rta_records()
-    # print('New records:')
-    # for record in new_records:
-    #     print(record)
-    # new_records = get_ss_records(CREDS)
-    # save_ss_records()
-    # print('New records:')
-    # for record in new_records:
-    #     print(record)
\ No newline at end of file
+    for source in get_board_sources(load_boards()):
+        source_records = get_source_records(source, CREDS)
+        if source_records != None:
+            save_source_records(source_records)
+        # print('New records:')
+        # for record in source_records.new_records:
+        #     print(record)
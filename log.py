@@ -1,4 +1,5 @@
 import time
+import json
 import os
 
 class Log:
@@ -10,6 +11,9 @@ class Log:
         self.__update_results: list[str] = []
         self.__error_message: str        = None
         self.__execution_time: float     = None
+        # (name, duration) of each traced phase of the run
+        self.__spans: list[tuple[str, float]] = []
+        self.__chrome_trace: dict        = None
 
     def set_nothing_to_update(self, nothing_to_update: bool) -> None:
         self.__nothing_to_update = nothing_to_update
@@ -17,6 +21,12 @@ class Log:
     def set_execution_time(self, execution_time: float) -> None:
         self.__execution_time = execution_time
     
+    def set_spans(self, spans: list[tuple[str, float]]) -> None:
+        self.__spans = spans
+
+    def set_chrome_trace(self, chrome_trace: dict) -> None:
+        self.__chrome_trace = chrome_trace
+
     def add_star_name(self, star_name: str, type: str) -> None:
         self.__star_names.append(f'{star_name} ({type})')
 
@@ -32,9 +42,15 @@ class Log:
         '''
         if not os.path.exists('.\\logs'):
             os.mkdir('.\\logs')
+        # Trace of the run, which can be opened in chrome://tracing
+        if self.__chrome_trace:
+            with open(f'logs\\{self.__timestamp}.trace.json', 'w') as file:
+                json.dump(self.__chrome_trace, file)
         with open(f'logs\\{self.__timestamp}.log', 'w+') as file:
             file.write(f'{self.__timestamp}\n')
             file.write(f'Exec_Time={self.__execution_time:.2f}s\n')
+            for i, (name, duration) in enumerate(self.__spans):
+                file.write(f'Span_{i}="{name}" {duration:.3f}s\n')
             if self.__nothing_to_update:
                 file.write('Info="No new RTA or SS records to update"')
                 return
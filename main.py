@@ -1,258 +1,516 @@
+from __future__ import annotations
+
+import argparse
+import heapq
+import os
 import traceback
-import requests
-import json
 import time
 
-from itertools import zip_longest
+from typing import TYPE_CHECKING
+
+# requests (which MediaWikiClient uses) is only imported
+# once there's something to update
+if TYPE_CHECKING:
+    from mediawiki import MediaWikiClient
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from replace_record import replace_record, replace_record_bowser, replace_record_multi_100c
-from get_records import get_rta_records, save_rta_records,     \
-                        get_ss_records, save_ss_records,       \
-                        get_creds, set_rta_record_not_to_save, \
-                        set_ss_record_not_to_save
+from get_records import get_source_records, save_source_records, \
+                        get_creds, refresh_creds, get_record_store, \
+                        are_sheets_unchanged, SourceRecords
+from sources import Source, load_boards, get_board_sources, CONFIG_FILE, RTA, SS
 from common import prefix_print, bcolors
 from log import Log
+from edit_planner import PageEdit, plan_page_edits, BOWSER, MULTI_100C
+from rate_limit import TokenBucket
+from page_cache import PageCache
+from tracing import TRACER, Span, span
+from poll_schedule import PollSchedule
 
 API = 'https://ukikipedia.net/mediawiki/api.php'
+# Maximum number of page titles MediaWiki allows per query
+MAX_TITLES_PER_QUERY = 50
+# Number of pages that can be edited concurrently
+EDIT_WORKERS = 4
+# Edits per second allowed across all workers, and how many
+# edits can be made back-to-back before being rate limited
+EDIT_RATE  = 2.0
+EDIT_BURST = 2
+# Max seconds of database replication lag before the wiki rejects
+# our requests (see https://www.mediawiki.org/wiki/Manual:Maxlag_parameter)
+MAXLAG = 5
+# Number of times to try a request that fails or that the wiki asks us
+# to retry (edits are only retried when the wiki asks us to)
+REQUEST_MAX_ATTEMPTS = 5
+# Seconds to wait to connect to the wiki, and to wait for each response
+REQUEST_TIMEOUT = (5, 30)
+EDIT_LIMITER = TokenBucket(EDIT_RATE, EDIT_BURST)
+# Edit errors that are likely to go away if the page is fetched
+# again and the edit is redone on top of its latest revision
+RETRYABLE_EDIT_ERRORS = frozenset(['editconflict', 'maxlag', 'ratelimited', 'readonly', 'badtoken', 'internal_api_error'])
+# Number of times to try updating a page whose edit fails with
+# a retryable error, and the seconds to wait before the first
+# retry (which doubles for each retry after it, up to the max)
+PAGE_UPDATE_MAX_ATTEMPTS = 4
+PAGE_UPDATE_RETRY_DELAY     = 1.0
+PAGE_UPDATE_MAX_RETRY_DELAY = 8.0
+# Star pages' infoboxes are all in their first section, so only
+# that section is ever downloaded or edited (rather than the
+# whole page, which can be a long guide)
+INFOBOX_SECTION = 0
+# Local copies of star pages' infobox sections, so
+# unchanged pages aren't downloaded again
+PAGE_CACHE_FILE = '.\\local_records\\infobox_section_cache.json'
+# Cookies of the last run's logged in session
+COOKIE_FILE = '.\\local_records\\wiki_cookies.txt'
+# Ukikipedia bot account
+BOT_USER = ''
+BOT_PASS = ''
+# Number of sources it takes for each one to be read in its own process.
+# Starting a process (which then has to load the Google API client
+# itself) takes longer than reading a couple of sheets, so fewer
+# sources than this are read on threads of this process instead.
+MIN_SOURCES_FOR_PROCESSES = 3
+
+def get_star_page_response(SESSION, title) -> tuple[str, str, str]:
+    '''Try to get the infobox section of a
+    star page, and return response'''
+    return SESSION.get_page(title, INFOBOX_SECTION)
+
+def get_query_responses(SESSION, titles: list[str], req_params: dict):
+    '''Run a query for the provided page titles using as few multi-title
+    requests as possible, and yield each response (along with a dict
+    that maps any titles MediaWiki normalized back to the requested ones)'''
+    for i in range(0, len(titles), MAX_TITLES_PER_QUERY):
+        batch_params = req_params | {'titles': '|'.join(titles[i:i+MAX_TITLES_PER_QUERY])}
+        # Large batches of page content can be split
+        # across multiple responses, so keep following
+        # the continue parameters until there are none left
+        while True:
+            response = SESSION.query(batch_params)
+            normalized = {i['to']: i['from'] for i in response['query'].get('normalized', [])}
+            yield response, normalized
+            if not 'continue' in response:
+                break
+            batch_params.update(response['continue'])
 
-def get_login_response(SESSION, BOT_USER, BOT_PASS) -> dict:
-    '''Try to log bot into Ukikipedia and return response'''
+@span('fetch_pages')
+def get_star_pages_response(SESSION, titles: list[str], page_cache: PageCache) \
+                            -> dict[str, tuple[str, str, str]]:
+    '''Get the infobox section of every provided star page using
+    as few multi-title queries as possible (only downloading pages
+    that have changed since they were cached), and return a dict of
+    get_star_page_response-style tuples keyed by title'''
+    prefix_print(f'Fetching {len(titles)} star page(s)...', end='')
+    # Check each page's latest revision id in bulk, which
+    # is much cheaper than getting each page's content
     req_params = {
-        'action': 'query',
-        'meta'  : 'tokens',
-        'type'  : 'login',
-        'format': 'json'
+        'action'       : 'query',
+        'prop'         : 'info',
+        'formatversion': 2,
+        'curtimestamp' : True
     }
-    prefix_print(f'Logging in to "{BOT_USER}"...', end='')
-    response = SESSION.get(url=API, params=req_params).json()
-    LOGIN_TOKEN = response['query']['tokens']['logintoken']
-    req_params = {
-            'action'    : 'login',
-            'lgname'    : BOT_USER,
-            'lgpassword': BOT_PASS,
-            'lgtoken'   : LOGIN_TOKEN,
-            'format'    : 'json'
-        }
-    return SESSION.post(API, data=req_params).json()
+    lastrevids = {}
+    START_TIMESTAMP = None
+    for response, normalized in get_query_responses(SESSION, titles, req_params):
+        if START_TIMESTAMP == None:
+            START_TIMESTAMP = response['curtimestamp']
+        for page in response['query']['pages']:
+            if 'lastrevid' in page:
+                lastrevids[normalized.get(page['title'], page['title'])] = page['lastrevid']
 
-def get_star_page_response(SESSION, star_name) -> tuple[str, str, str, str]:
-    '''Try to get a star's RTA Guide page text, and return response'''
+    # Download content for pages that aren't cached or are out of date
+    stale_titles = [title for title in titles if title in lastrevids
+                    and not page_cache.is_fresh(title, lastrevids[title])]
     req_params = {
         'action'       : 'query',
-        'meta'         : 'tokens',
-        'titles'       : 'RTA Guide/' + star_name, # page name
         'prop'         : 'revisions',
         'rvslots'      : 'main',
-        'rvprop'       : 'content|timestamp',
-        'formatversion': 2,
-        'curtimestamp' : True,
-        'format'       : 'json'
+        'rvprop'       : 'content|timestamp|ids',
+        'rvsection'    : INFOBOX_SECTION,
+        'formatversion': 2
     }
-    response = json.loads(SESSION.get(url=API, params=req_params).text)
+    for response, normalized in get_query_responses(SESSION, stale_titles, req_params):
+        for page in response['query']['pages']:
+            if not 'revisions' in page:
+                continue
+            revision = page['revisions'][0]
+            page_cache.update(normalized.get(page['title'], page['title']), revision['revid'],
+                              revision['timestamp'], revision['slots']['main']['content'])
+    print(f'{bcolors.OKGREEN}Success{bcolors.ENDC} ({len(lastrevids) - len(stale_titles)} cached)')
 
-    page_text = response['query']['pages'][0]['revisions'][0]['slots']['main']['content']
-    BASE_TIMESTAMP  = response['query']['pages'][0]['revisions'][0]['timestamp']
-    START_TIMESTAMP = response['curtimestamp']
-    CSRF_TOKEN = response['query']['tokens']['csrftoken']
+    pages = {}
+    for title in titles:
+        cached_page = page_cache.get(title)
+        # Missing pages get empty page text, which
+        # the main loop will treat as a failed fetch
+        if cached_page == None or not title in lastrevids:
+            pages[title] = ('', None, START_TIMESTAMP)
+        else:
+            pages[title] = (*cached_page, START_TIMESTAMP)
+    return pages
 
-    return page_text, BASE_TIMESTAMP, START_TIMESTAMP, CSRF_TOKEN
+@span('edit')
+def get_edit_star_page_response(SESSION, title, page_text, summary, \
+                                BASE_TIMESTAMP, START_TIMESTAMP):
+    '''Edit the infobox section of a star page with the new
+    updated section text containing the new record(s)'''
+    return SESSION.edit_page(title, page_text, summary, \
+                             BASE_TIMESTAMP, START_TIMESTAMP, INFOBOX_SECTION)
 
-def get_edit_star_page_response(SESSION, star_name, page_text, summary, \
-                                CSRF_TOKEN, BASE_TIMESTAMP, START_TIMESTAMP):
-    '''Edit a star's RTA Guide page with the new
-    updated page text containing the new record(s)'''
-    req_params = {
-        'action'        : 'edit',
-        'title'         : 'RTA Guide/' + star_name,
-        'token'         : CSRF_TOKEN,
-        'basetimestamp' : BASE_TIMESTAMP,
-        'starttimestamp': START_TIMESTAMP,
-        'bot'           : True,
-        'text'          : page_text,
-        'summary'       : summary,
-        'format'        : 'json'
-    }
-    prefix_print(f'Editing page "RTA Guide/{star_name}"...', end='')
-    return SESSION.post(API, data=req_params).json()
+@span('login')
+def login() -> MediaWikiClient | None:
+    '''Log bot into Ukikipedia (carrying on with the last run's
+    session if it's still logged in), and return the logged
+    in session (or None if logging in failed)'''
+    from mediawiki import MediaWikiClient
+    SESSION = MediaWikiClient(API, BOT_USER, BOT_PASS, COOKIE_FILE, EDIT_LIMITER, MAXLAG,
+                              REQUEST_MAX_ATTEMPTS, REQUEST_TIMEOUT, EDIT_WORKERS)
+    # Print the whole line at once, since logging in
+    # can happen while the sheets are being downloaded
+    if SESSION.resume():
+        prefix_print(f'Logging in to "{BOT_USER}"...{bcolors.OKGREEN}Success{bcolors.ENDC} (saved session)')
+        return SESSION
+    if SESSION.login():
+        SESSION.save_cookies()
+        prefix_print(f'Logging in to "{BOT_USER}"...{bcolors.OKGREEN}Success{bcolors.ENDC}')
+        return SESSION
+    prefix_print(f'Logging in to "{BOT_USER}"...{bcolors.FAIL}Failed{bcolors.ENDC}')
+    return None
 
-def main():
-    t1 = time.time()
-    log = Log()
-    # Get new RTA and single star records from their respective spreadsheets
-    SHEETS_CREDS = get_creds()
-    new_rta_records = get_rta_records(SHEETS_CREDS)
-    new_ss_records = get_ss_records(SHEETS_CREDS)
+def set_page_edit_not_to_save(page_edit: PageEdit, board_records: dict[str, list[SourceRecords]]) -> None:
+    '''Don't save any of a page edit's records to local file (board_records
+    holds what was read from each board's sources, keyed by board name)'''
+    for source_records in board_records[page_edit.board]:
+        # A board can have more than one source of a kind, so
+        # only the source a record came from holds it back
+        new_record_ids = {id(record) for record in source_records.new_records}
+        for record in (page_edit.rta_records if source_records.source.kind == RTA else page_edit.ss_records):
+            if id(record) in new_record_ids:
+                source_records.set_record_not_to_save(record)
 
-    # Stop execution if there are errors retrieving data from
-    # either spreadsheet or there are no new records to update
-    if new_rta_records == None:
-        msg = 'Failed to retrieve data from RTA spreadsheet!'
-        log.add_error_message(msg)
-        prefix_print(f'{bcolors.FAIL}Error:{bcolors.ENDC} {msg}')
-        return
-    if new_ss_records == None:
-        msg = 'Failed to retrieve data from single star spreadsheet!'
-        log.add_error_message(msg)
-        prefix_print(f'{bcolors.FAIL}Error:{bcolors.ENDC} {msg}')
-        return
-    if new_rta_records == [] and new_ss_records == []:
-        log.set_nothing_to_update(True)
-        prefix_print('No new single star or RTA records to update...')
-        return
-    # Make new records lists parallel (i.e. each
-    # star will have its own entry in both lists)
-    if new_rta_records == []:
-        prefix_print('No new RTA records to update...')
-    else:
-        for i, new_record in enumerate(new_rta_records[:]):
-            if new_record:
-                # Check if the name of the current RTA record
-                # is also present in the SS records list
-                if new_record[2] not in [record[2] for record in set(new_ss_records) if record]:
-                    new_ss_records.insert(i, None)
-    if new_ss_records == []:
-        prefix_print('No new single star records to update...')
+def update_star_page(SESSION, page: tuple[str, str, str], page_cache: PageCache, page_edit: PageEdit, \
+                     board_records: dict[str, list[SourceRecords]], is_last_attempt: bool = True) -> str | None:
+    '''Update a star page with all of its new records in a single
+    edit, and return the update result (or None if the edit failed
+    in a way that's worth retrying, unless this is the last attempt)'''
+    title = page_edit.title
+    # Get current star page's text and some other
+    # necessary parameters needed to edit the page
+    page_text, BASE_TIMESTAMP, START_TIMESTAMP = page
+    # Handle failure to retrieve page text
+    if not '{{speedrun_infobox' in page_text and not '{{speedrun_infobox_bowser_level' in page_text:
+        msg = f"Couldn't get page content for '{title}'!"
+        prefix_print(f"{bcolors.FAIL}Error{bcolors.ENDC}: {msg} Skipping record(s)...")
+        # Don't save records to local file if they fail to update...
+        set_page_edit_not_to_save(page_edit, board_records)
+        return msg
+
+    # Bowser stage records handling...
+    if page_edit.kind == BOWSER:
+        page_text, summary = replace_record_bowser(page_text, **page_edit.records)
+    # Multi-strategy 100c records handling...
+    elif page_edit.kind == MULTI_100C:
+        page_text, summary = replace_record_multi_100c(page_text, **page_edit.records)
+    # Normal record handling
     else:
-        for i, new_record in enumerate(new_ss_records[:]):
-            if new_record:
-                # Check if the name of the current SS record
-                # is also present in the RTA records list
-                if new_record[2] not in [record[2] for record in set(new_rta_records) if record]:
-                    new_rta_records.insert(i, None)
+        page_text, summary = replace_record(page_text, **page_edit.records)
 
-    try:
-        SESSION = requests.Session()
-        # Login to Ukikipedia
-        BOT_USER = ''
-        BOT_PASS = ''
-        response = get_login_response(SESSION, BOT_USER, BOT_PASS)
-        if response['login']['result'] == 'Success':
-            print(f'{bcolors.OKGREEN}Success{bcolors.ENDC}')
-        else:
-            log.set_error_message(f'Failed to login to {BOT_USER}!')
-            log.out()
-            print(f'{bcolors.FAIL}Failed{bcolors.ENDC}')
-            return
+    # page_text will be None if the record is
+    # already updated (or the page has a faster time
+    # than either spreadsheet, e.g. from a manual edit),
+    # so just skip ahead to the next page
+    if page_text == None:
+        msg = f"Page '{title}' is either already updated or has a faster time than was provided!"
+        prefix_print(f"{msg} Skipping record(s)...")
+        return f'"{msg}"'
 
-        # Iterate over new RTA and single star records. The replace_record functions can set both an RTA
-        # and a single star record in a single edit request to a given star page, but will only act upon
-        # the arguments they're given. So if there is only an RTA or single star record to update for a
-        # given star's page, then the other record will be passed as None to the appropriate replace_record
-        # function (as per the fillvalue in the zip_longest call). 
-        for new_rta_record, new_ss_record in zip_longest(new_rta_records, new_ss_records, fillvalue=None):
+    response = get_edit_star_page_response(SESSION, title, page_text, summary, \
+                                           BASE_TIMESTAMP, START_TIMESTAMP)
+    if response.get('edit', {}).get('result') == 'Success':
+        # Cache the text we just wrote so the page doesn't need
+        # to be downloaded again unless someone else edits it
+        if 'newrevid' in response['edit']:
+            page_cache.update(title, response['edit']['newrevid'],
+                              response['edit']['newtimestamp'], page_text)
+        prefix_print(f'Editing page "{title}"...{bcolors.OKGREEN}Success{bcolors.ENDC}')
+        return 'Success'
+    # Let the page be fetched again and the edit redone on top of
+    # it if someone else edited it first (or the wiki was busy)
+    error_code = response.get('error', {}).get('code', '')
+    if not is_last_attempt and (error_code in RETRYABLE_EDIT_ERRORS or error_code.startswith('internal_api_error')):
+        prefix_print(f'Editing page "{title}"...{bcolors.WARNING}{error_code}{bcolors.ENDC} (retrying)')
+        return None
+    # Handle failure to edit page text
+    prefix_print(f'Editing page "{title}"...{bcolors.FAIL}Failed{bcolors.ENDC}')
+    # Don't save records to local file if they fail to update...
+    set_page_edit_not_to_save(page_edit, board_records)
+    return f"\"Failed to edit page '{title}'\""
 
-            time.sleep(0.5)
+def try_update_star_page(SESSION, pages: dict[str, tuple[str, str, str]], page_cache: PageCache, page_edit: PageEdit, \
+                         board_records: dict[str, list[SourceRecords]], attempt: int = 0) -> str | None:
+    '''Run update_star_page, and return an update result instead of
+    raising if anything goes wrong. Retries (attempt > 0) fetch just
+    this star's page again (with fresh timestamps) instead of using
+    the prefetched one.'''
+    try:
+        with span('update_page', page=page_edit.title, attempt=attempt):
+            if attempt == 0:
+                page = pages[page_edit.title]
+            else:
+                with span('refetch_page'):
+                    page = get_star_page_response(SESSION, page_edit.title)
+            return update_star_page(SESSION, page, page_cache, page_edit, board_records,
+                                    attempt + 1 >= PAGE_UPDATE_MAX_ATTEMPTS)
+    except Exception as e:
+        print(traceback.format_exc())
+        # Don't save records to local file if they fail to update...
+        set_page_edit_not_to_save(page_edit, board_records)
+        return f'"{type(e).__name__} occurred while updating record(s)"'
 
-            # Get star name from whichever record isn't currently None
-            new_record_star_name = new_rta_record[2] if new_rta_record != None else new_ss_record[2]
-            # Special case handling control variables
-            is_bowser_course_record = False
-            is_bowser_reds_record = False
-            is_first_multi_100c_record = False
-            is_second_multi_100c_record = False
+def read_source(source: Source, SHEETS_CREDS) -> SourceRecords | None:
+    '''Run get_source_records, and return None (as if the sheet couldn't
+    be read) instead of raising if anything goes wrong'''
+    try:
+        return get_source_records(source, SHEETS_CREDS)
+    except Exception:
+        print(traceback.format_exc())
+        return None
 
-            # Format bowser stage records appropriately and
-            # update the respective control variable
-            if new_record_star_name[:6] == 'Bowser':
-                if 'Course' in new_record_star_name:
-                    new_record_star_name = new_record_star_name[:-9]
-                    is_bowser_course_record = True
-                else:
-                    new_record_star_name = new_record_star_name[:-10]
-                    is_bowser_reds_record = True
-            # Special case handling for multi-strategy 100c stars
-            elif new_rta_record and '100' in new_record_star_name:
-                if 1 in [i for i in new_rta_record]:
-                    is_first_multi_100c_record = True
-                elif 2 in [i for i in new_rta_record]:
-                    is_second_multi_100c_record = True
+def read_source_in_process(source: Source, SHEETS_CREDS) -> tuple[SourceRecords | None, list[Span]]:
+    '''Run read_source in a worker process, and return the spans it traced
+    along with what it read (as they'd otherwise stay in the worker)'''
+    # Drop the spans of any source the worker read before this one
+    TRACER.reset()
+    source_records = read_source(source, SHEETS_CREDS)
+    return source_records, TRACER.get_spans()
 
-            # If the current star is the second record for a
-            # multi-strategy 100c star, add '2' to the current
-            # star name in the log
-            if is_second_multi_100c_record:
-                log.add_star_name(new_record_star_name + ' 2', 'RTA')
-            else:
-                log.add_star_name(new_record_star_name, ('RTA' if new_rta_record != None else 'SS'))
+@span('read_sources')
+def read_sources(sources: list[Source], SHEETS_CREDS) -> dict[str, SourceRecords | None]:
+    '''Read every source's new records at the same time, each in a worker
+    of its own (so no source's state can leak into another's), and return
+    what each one read keyed by source name. With enough sources, each
+    worker is its own process, so that parsing scales with the number of
+    cores rather than being held up by the GIL.'''
+    if len(sources) >= MIN_SOURCES_FOR_PROCESSES and (os.cpu_count() or 1) > 1:
+        # (multiprocessing takes a while to import, so only import it once needed)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Open the record store (which imports any old local records
+        # files) once here, rather than in every worker at once
+        get_record_store()
+        # Workers are spawned rather than forked, so they start with none
+        # of this process's state: forked workers would share the record
+        # store's SQLite connection (which can't be used across a fork)
+        # and copy locks that the login thread may be holding
+        with ProcessPoolExecutor(max_workers=min(len(sources), os.cpu_count()),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {source.name: executor.submit(read_source_in_process, source, SHEETS_CREDS) for source in sources}
+            source_records = {}
+            for name, future in futures.items():
+                source_records[name], spans = future.result()
+                TRACER.add_spans(spans)
+            return source_records
+    # Threads share the same Sheets service
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        futures = {source.name: executor.submit(read_source, source, SHEETS_CREDS) for source in sources}
+        return {name: future.result() for name, future in futures.items()}
 
-            # Get current star's RTA Guide page text and some other
-            # necessary parameters needed to edit the page
-            page_text, BASE_TIMESTAMP, START_TIMESTAMP, CSRF_TOKEN = \
-                get_star_page_response(SESSION, new_record_star_name)
-            # Handle failure to retrieve page text
-            if not '{{speedrun_infobox' in page_text and not '{{speedrun_infobox_bowser_level' in page_text:
-                msg = f"Couldn't get page content for '{new_record_star_name}'!"
-                log.add_update_result(msg)
-                prefix_print(f"{bcolors.FAIL}Error{bcolors.ENDC}: {msg} Skipping record...")
-                # Don't save record to local file if it fails to update...
-                if new_rta_record:
-                    set_rta_record_not_to_save(new_rta_record)
-                if new_ss_record:
-                    set_ss_record_not_to_save(new_ss_record)
-                continue
+def get_page_update_retry_delay(attempt: int) -> float:
+    '''Get how many seconds to wait before a retry of a page update
+    (exponential backoff from the first retry, attempt 1)'''
+    return min(PAGE_UPDATE_RETRY_DELAY * 2 ** (attempt - 1), PAGE_UPDATE_MAX_RETRY_DELAY)
 
-            # Bowser stage records handling...
-            if is_bowser_course_record:
-                page_text, summary = replace_record_bowser(page_text, new_rta_course_record=new_rta_record, new_ss_course_record=new_ss_record)
-            elif is_bowser_reds_record:
-                page_text, summary = replace_record_bowser(page_text, new_rta_reds_record=new_rta_record, new_ss_reds_record=new_ss_record)
-            # Multi-strategy 100c records handling...
-            elif is_first_multi_100c_record:
-                page_text, summary = replace_record_multi_100c(page_text, new_rta_100c_record_1=new_rta_record, new_ss_record=new_ss_record)
-            elif is_second_multi_100c_record:
-                page_text, summary = replace_record_multi_100c(page_text, new_rta_100c_record_2=new_rta_record, new_ss_record=new_ss_record)
-            # Normal record handling
-            else:
-                page_text, summary = replace_record(page_text, new_rta_record=new_rta_record, new_ss_record=new_ss_record)
+@span('main')
+def main(SHEETS_CREDS=None, SESSION: MediaWikiClient = None) -> bool:
+    '''Update every new record on every board (set of pages) in the
+    sources config, and return whether there were any new records.
+    Credentials and an already logged in session can be passed in
+    to save getting new ones (e.g. in daemon mode).'''
+    t1 = time.time()
+    TRACER.reset()
+    log = Log()
+    # Read the config every run, so the daemon picks up changes to it
+    boards = load_boards(CONFIG_FILE)
+    sources = get_board_sources(boards)
+    # Skip loading credentials (and the Google API client) entirely if
+    # none of the spreadsheets have been modified since they were last processed
+    if SHEETS_CREDS == None and are_sheets_unchanged(sources):
+        log.set_nothing_to_update(True)
+        prefix_print('No new records to update...')
+        return False
+    # Log in to Ukikipedia while the spreadsheets are being downloaded
+    executor = ThreadPoolExecutor(max_workers=1)
+    login_future = executor.submit(login) if SESSION == None else None
+    # Get new records from every source at the same time
+    if SHEETS_CREDS == None:
+        SHEETS_CREDS = get_creds()
+    source_records = read_sources(sources, SHEETS_CREDS)
+    executor.shutdown(wait=False)
 
-            # page_text will be None if the record is
-            # already updated (or has a faster time due
-            # to me ignoring the extensions sheet for now), 
-            # so just skip ahead to the next record in the list
-            if page_text == None:
-                msg = f"Page 'RTA Guide/{new_record_star_name}' is either already updated or has a faster time than was provided!"
-                log.add_update_result(f'"{msg}"')
-                prefix_print(f"{msg} Skipping record...")
-                continue
+    # Leave out sources that couldn't be read, and update
+    # the records from the rest of them as usual
+    error_messages = []
+    for source in sources:
+        if source_records[source.name] == None:
+            msg = f'Failed to retrieve data from {source.label} spreadsheet!'
+            error_messages.append(msg)
+            prefix_print(f'{bcolors.FAIL}Error:{bcolors.ENDC} {msg}')
+        elif source_records[source.name].new_records == []:
+            prefix_print(f'No new {source.label} records to update...')
+    if error_messages:
+        log.add_error_message(' '.join(error_messages))
+    read_source_records = [cur_source_records for cur_source_records in source_records.values() if cur_source_records != None]
+    if not any(cur_source_records.new_records for cur_source_records in read_source_records):
+        # Mark sheets that had nothing left to update as processed
+        for cur_source_records in read_source_records:
+            save_source_records(cur_source_records)
+        if not error_messages:
+            log.set_nothing_to_update(True)
+            prefix_print('No new records to update...')
+        return False
 
-            time.sleep(0.5)
+    # Group every new record by the page of each board it belongs to, so
+    # that each page is only fetched and edited once (and so is only
+    # ever being edited by one worker at a time)
+    page_edits = []
+    # What was read from each board's sources, keyed by board name
+    board_records = {}
+    with span('plan_page_edits'):
+        for board in boards:
+            board_records[board.name] = [source_records[source.name] for source in board.sources
+                                         if source_records[source.name] != None]
+            new_rta_records = [record for cur_source_records in board_records[board.name] if cur_source_records.source.kind == RTA
+                               for record in cur_source_records.new_records]
+            new_ss_records = [record for cur_source_records in board_records[board.name] if cur_source_records.source.kind == SS
+                              for record in cur_source_records.new_records]
+            page_edits += plan_page_edits(new_rta_records, new_ss_records, board.name, board.title_prefix)
+    # Update results for each page edit, keyed by the page edit's index
+    update_results = {}
+    page_cache = PageCache(PAGE_CACHE_FILE)
+    try:
+        # Wait to finish logging in to Ukikipedia
+        if SESSION == None:
+            SESSION = login_future.result()
+            if SESSION == None:
+                log.add_error_message(f'Failed to login to {BOT_USER}!')
+                return True
 
-            response = get_edit_star_page_response(SESSION, new_record_star_name, page_text, summary, \
-                                                   CSRF_TOKEN, BASE_TIMESTAMP, START_TIMESTAMP)
-            if response['edit']['result'] == 'Success':
-                log.add_update_result('Success')
-                print(f'{bcolors.OKGREEN}Success{bcolors.ENDC}')
-            # Handle failure to edit page text
-            else:
-                log.add_update_result(f"\"Failed to edit page 'RTA Guide/{new_record_star_name}'\"")
-                print(f'{bcolors.FAIL}Failed{bcolors.ENDC}')
-                # Don't save record to local file if it fails to update...
-                if new_rta_record:
-                    set_rta_record_not_to_save(new_rta_record)
-                if new_ss_record:
-                    set_ss_record_not_to_save(new_ss_record)
+        # Prefetch every star page that needs to be edited up front,
+        # rather than making a separate request for each star
+        pages = get_star_pages_response(SESSION, list(dict.fromkeys(page_edit.title for page_edit in page_edits)), page_cache)
 
+        with ThreadPoolExecutor(max_workers=EDIT_WORKERS) as executor:
+            # Futures keyed by (page edit index, attempt)
+            futures = {executor.submit(try_update_star_page, SESSION, pages, page_cache, page_edit, board_records): (i, 0)
+                       for i, page_edit in enumerate(page_edits)}
+            # Retries waiting out their backoff, as a heap of (time they can
+            # be queued at, page edit index, attempt). They're only queued
+            # once they're due, so that backing off never ties up a worker
+            # that could be editing another page in the meantime.
+            retries = []
+            while futures or retries:
+                # Queue due retries behind the pages still waiting to be edited
+                while retries and retries[0][0] <= time.monotonic():
+                    _, i, attempt = heapq.heappop(retries)
+                    futures[executor.submit(try_update_star_page, SESSION, pages, page_cache,
+                                            page_edits[i], board_records, attempt)] = (i, attempt)
+                timeout = max(0, retries[0][0] - time.monotonic()) if retries else None
+                if not futures:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, attempt = futures.pop(future)
+                    update_result = future.result()
+                    if update_result == None:
+                        heapq.heappush(retries, (time.monotonic() + get_page_update_retry_delay(attempt + 1), i, attempt + 1))
+                    else:
+                        update_results[i] = update_result
     except (Exception, KeyboardInterrupt) as e:
-        # Don't save record to local file if it fails to update...
-        if new_rta_record:
-            set_rta_record_not_to_save(new_rta_record)
-        else:
-            set_ss_record_not_to_save(new_ss_record)
         # Don't print traceback for KeyboardInterrupt
         if type(e).__name__ != 'KeyboardInterrupt':
             print(traceback.format_exc())
         prefix_print(f'{bcolors.FAIL}Error{bcolors.ENDC}: {type(e).__name__} occurred! Exiting...')
-        return
+        if type(e).__name__ == 'KeyboardInterrupt':
+            raise
+        return True
     finally:
-        # Save records and output log
-        # at the end of the session
-        save_rta_records()
-        save_ss_records()
+        # Don't save records to local file if they never got updated...
+        for i, page_edit in enumerate(page_edits):
+            if not i in update_results:
+                set_page_edit_not_to_save(page_edit, board_records)
+        # Save every source's records and output
+        # log at the end of the session
+        for cur_source_records in read_source_records:
+            save_source_records(cur_source_records)
+        with span('save_page_cache'):
+            page_cache.save()
+        # Save the session's cookies (which the wiki may have
+        # refreshed) so the next run can carry on with it
+        if SESSION != None:
+            SESSION.save_cookies()
+        # Log results in the same order as the records themselves
+        for i in sorted(update_results):
+            log.add_star_name(page_edits[i].title, page_edits[i].get_record_types())
+            log.add_update_result(update_results[i])
         # Log and print total execution time
         exec_time = (time.time() - t1)
         log.set_execution_time(exec_time)
+        # Output how long each phase of the run took
+        spans = TRACER.get_spans()
+        log.set_spans([(cur_span.name + ''.join(f' [{value}]' for value in cur_span.args.values()),
+                        cur_span.get_duration()) for cur_span in spans])
+        log.set_chrome_trace(TRACER.get_chrome_trace())
         log.out()
         prefix_print(f'{bcolors.OKGREEN}Done{bcolors.ENDC}: took {exec_time:.2f}s')
+    return True
+
+def run_daemon(min_interval: float, max_interval: float) -> None:
+    '''Keep polling the spreadsheets for new records (on an interval
+    that adapts to how often records change), keeping credentials,
+    API services and the logged in session warm between polls'''
+    SHEETS_CREDS = get_creds()
+    SESSION = None
+    schedule = PollSchedule(min_interval, max_interval)
+    prefix_print('Running in daemon mode (Ctrl+C to stop)...')
+    try:
+        while True:
+            try:
+                refresh_creds(SHEETS_CREDS)
+                if SESSION == None:
+                    SESSION = login()
+                # Without a session, main would log in on its own (and
+                # the session it got would be thrown away), so skip
+                # this poll and try logging in again on the next one
+                if SESSION == None:
+                    changed = False
+                else:
+                    changed = main(SHEETS_CREDS, SESSION)
+            except Exception:
+                # Keep the daemon alive through any one bad poll
+                print(traceback.format_exc())
+                changed = False
+            interval = schedule.next_interval(changed)
+            prefix_print(f'Next poll in {interval:.0f}s...')
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        prefix_print('Stopping daemon...')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Update world records on the Ukikipedia RTA Guide')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running and poll the spreadsheets for new records')
+    parser.add_argument('--min-interval', type=float, default=30,
+                        help='seconds between polls while records are changing (daemon mode)')
+    parser.add_argument('--max-interval', type=float, default=900,
+                        help='most seconds between polls while records are unchanged (daemon mode)')
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon(args.min_interval, args.max_interval)
+    else:
+        try:
+            main()
+        except KeyboardInterrupt:
+            pass
\ No newline at end of file
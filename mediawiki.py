@@ -0,0 +1,239 @@
+import os
+import random
+import threading
+import time
+
+import requests
+
+from http.cookiejar import LWPCookieJar, LoadError
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TokenBucket
+
+class MediaWikiClient:
+    '''
+    Thread-safe client for a wiki's action API. Connections are pooled
+    and kept alive between requests (with enough of them for every edit
+    worker), responses are gzip compressed, and every request has a
+    timeout and a maxlag parameter. Reads are retried with jittered
+    exponential backoff if they fail or the wiki asks us to back off;
+    edits only wait and retry when the wiki asks them to, since a
+    failed edit may have gone through anyway.
+
+    Cookies are saved to file between runs, so a run can carry on with
+    the last run's login (which takes one cheap userinfo query to check)
+    instead of logging in again. The CSRF token is only fetched once
+    per session, and is renewed (logging in again if need be) whenever
+    the wiki says it's gone bad.
+    '''
+    USER_AGENT = 'UWRUS/1.0 (https://github.com/tjk113/UWRUS)'
+    # Seconds to wait before the first retry of a failed read
+    # (which doubles for each retry after it, up to the max)
+    RETRY_DELAY     = 0.5
+    MAX_RETRY_DELAY = 8.0
+
+    def __init__(self, api: str, user: str, password: str, cookie_file: str, \
+                 edit_limiter: TokenBucket = None, maxlag: int = 5, max_attempts: int = 5, \
+                 timeout: tuple[float, float] = (5, 30), pool_size: int = 10) -> None:
+        self.__api: str               = api
+        self.__user: str              = user
+        self.__password: str          = password
+        self.__cookie_file: str       = cookie_file
+        self.__edit_limiter: TokenBucket = edit_limiter
+        self.__maxlag: int            = maxlag
+        self.__max_attempts: int      = max_attempts
+        # (connect, read) timeouts in seconds
+        self.__timeout: tuple[float, float] = timeout
+        self.__csrf_token: str        = None
+        self.__lock = threading.Lock()
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.__session.mount('https://', adapter)
+        self.__session.mount('http://', adapter)
+        self.__session.headers.update({'User-Agent': self.USER_AGENT, 'Accept-Encoding': 'gzip, deflate'})
+        self.__session.cookies = LWPCookieJar(cookie_file)
+        if os.path.exists(cookie_file):
+            try:
+                # MediaWiki's session cookies expire when the browser
+                # closes, so they'd be discarded without ignore_discard
+                self.__session.cookies.load(ignore_discard=True)
+            except (OSError, LoadError):
+                pass
+
+    def __send(self, method: str, params: dict) -> requests.Response:
+        params = params | {'format': 'json', 'maxlag': self.__maxlag}
+        if method == 'GET':
+            return self.__session.get(self.__api, params=params, timeout=self.__timeout)
+        return self.__session.post(self.__api, data=params, timeout=self.__timeout)
+
+    def __get_retry_after(self, response: requests.Response) -> float | None:
+        '''
+        Get how many seconds the wiki wants us to wait before trying
+        a request again (if it's lagged or asking us to slow down)
+        '''
+        if 'Retry-After' in response.headers or response.status_code in (429, 503):
+            try:
+                return float(response.headers.get('Retry-After', self.__maxlag))
+            except ValueError:
+                return float(self.__maxlag)
+        return None
+
+    def __get_retry_delay(self, attempt: int) -> float:
+        # Full jitter, so that workers that failed at the
+        # same time don't all retry at the same time too
+        return random.uniform(0, min(self.RETRY_DELAY * 2 ** attempt, self.MAX_RETRY_DELAY))
+
+    def query(self, params: dict) -> dict:
+        '''
+        Run a read-only API request, retrying it if it fails
+        '''
+        for attempt in range(self.__max_attempts):
+            is_last_attempt = attempt + 1 == self.__max_attempts
+            try:
+                response = self.__send('GET', params)
+            except (requests.ConnectionError, requests.Timeout):
+                if is_last_attempt:
+                    raise
+                time.sleep(self.__get_retry_delay(attempt))
+                continue
+            retry_after = self.__get_retry_after(response)
+            if is_last_attempt or (retry_after == None and response.status_code < 500):
+                return response.json()
+            if retry_after != None:
+                time.sleep(retry_after + random.uniform(0, 1))
+            else:
+                time.sleep(self.__get_retry_delay(attempt))
+
+    def __check_session(self) -> bool:
+        '''
+        Check whether the session is logged in, getting
+        a CSRF token in the same request if it is
+        '''
+        response = self.query({'action': 'query', 'meta': 'userinfo|tokens', 'formatversion': 2})
+        if response['query']['userinfo'].get('anon'):
+            return False
+        self.__csrf_token = response['query']['tokens']['csrftoken']
+        return True
+
+    def __log_in(self) -> bool:
+        response = self.query({'action': 'query', 'meta': 'tokens', 'type': 'login'})
+        LOGIN_TOKEN = response['query']['tokens']['logintoken']
+        req_params = {
+            'action'    : 'login',
+            'lgname'    : self.__user,
+            'lgpassword': self.__password,
+            'lgtoken'   : LOGIN_TOKEN
+        }
+        response = self.__send('POST', req_params).json()
+        return response['login']['result'] == 'Success' and self.__check_session()
+
+    def resume(self) -> bool:
+        '''
+        Check whether the session saved by the last run is still
+        logged in (and if so, get this session's CSRF token)
+        '''
+        with self.__lock:
+            return len(self.__session.cookies) > 0 and self.__check_session()
+
+    def login(self) -> bool:
+        '''
+        Log in (and get this session's CSRF token),
+        and return whether logging in succeeded
+        '''
+        with self.__lock:
+            return self.__log_in()
+
+    def get_csrf_token(self) -> str:
+        with self.__lock:
+            if self.__csrf_token == None and not self.__check_session():
+                self.__log_in()
+            return self.__csrf_token
+
+    def renew_csrf_token(self, bad_token: str) -> str:
+        '''
+        Get a new CSRF token after the wiki rejected bad_token (logging
+        in again if the session expired). Workers that all had the same
+        token rejected at once only end up renewing it once.
+        '''
+        with self.__lock:
+            if self.__csrf_token == bad_token:
+                self.__csrf_token = None
+                if not self.__check_session():
+                    self.__log_in()
+            return self.__csrf_token
+
+    def get_page(self, title: str, section: int = None) -> tuple[str, str, str]:
+        '''
+        Get a page's text (or just one of its sections), along with
+        the timestamp of its latest revision and the current
+        timestamp (for editing it)
+        '''
+        req_params = {
+            'action'       : 'query',
+            'titles'       : title,
+            'prop'         : 'revisions',
+            'rvslots'      : 'main',
+            'rvprop'       : 'content|timestamp',
+            'formatversion': 2,
+            'curtimestamp' : True
+        }
+        if section != None:
+            req_params['rvsection'] = section
+        response = self.query(req_params)
+        revision = response['query']['pages'][0]['revisions'][0]
+        return revision['slots']['main']['content'], revision['timestamp'], response['curtimestamp']
+
+    def edit_page(self, title: str, text: str, summary: str, base_timestamp: str, start_timestamp: str, \
+                  section: int = None) -> dict:
+        '''
+        Replace a page's text (or just one of its sections) as a bot
+        edit, and return the response. The edit fails with an edit
+        conflict if the page has been edited since base_timestamp
+        (unless MediaWiki can merge the two edits), and never
+        creates the page if it doesn't exist.
+        '''
+        req_params = {
+            'action'        : 'edit',
+            'title'         : title,
+            'token'         : self.get_csrf_token(),
+            'basetimestamp' : base_timestamp,
+            'starttimestamp': start_timestamp,
+            'bot'           : True,
+            'nocreate'      : True,
+            'text'          : text,
+            'summary'       : summary
+        }
+        if section != None:
+            req_params['section'] = section
+        for _ in range(self.__max_attempts):
+            # Wait for our turn to edit according to the shared rate limiter
+            if self.__edit_limiter:
+                self.__edit_limiter.acquire()
+            response = self.__send('POST', req_params)
+            # Back off and try again if the wiki is lagged or is
+            # asking us to slow down, otherwise return the response
+            retry_after = self.__get_retry_after(response)
+            if retry_after != None:
+                if self.__edit_limiter:
+                    self.__edit_limiter.backoff(retry_after)
+                else:
+                    time.sleep(retry_after)
+                continue
+            # Get a new CSRF token and try again if ours has gone bad
+            # (e.g. if the session expired partway through the run)
+            if response.json().get('error', {}).get('code') == 'badtoken':
+                req_params['token'] = self.renew_csrf_token(req_params['token'])
+                continue
+            if self.__edit_limiter:
+                self.__edit_limiter.recover()
+            return response.json()
+        return response.json()
+
+    def save_cookies(self) -> None:
+        '''
+        Write the session's cookies to file for the next run
+        '''
+        with self.__lock:
+            self.__session.cookies.save(ignore_discard=True)
+        # The cookies are as good as the bot's password
+        os.chmod(self.__cookie_file, 0o600)
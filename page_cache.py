@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import threading
+
+class PageCache:
+    '''
+    On-disk cache of wiki page text keyed by page title. Each entry
+    stores the revision id and timestamp the text belongs to, along with
+    a hash of the text, so that a page only needs to be downloaded again
+    if someone else has edited it since it was cached.
+    '''
+    def __init__(self, path: str) -> None:
+        self.__path: str          = path
+        self.__pages: dict[str, dict] = {}
+        self.__lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.__pages = json.load(file)
+
+    @staticmethod
+    def __hash(text: str) -> str:
+        # Same hash MediaWiki uses for rvprop=sha1
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def is_fresh(self, title: str, lastrevid: int) -> bool:
+        '''
+        Check whether the cached text for a page is
+        from the page's latest revision
+        '''
+        page = self.__pages.get(title)
+        return page != None and page['revid'] == lastrevid \
+               and page['sha1'] == self.__hash(page['text'])
+
+    def get(self, title: str) -> tuple[str, str] | None:
+        '''
+        Get the cached text and revision timestamp for a page
+        '''
+        page = self.__pages.get(title)
+        if page == None:
+            return None
+        return page['text'], page['timestamp']
+
+    def update(self, title: str, revid: int, timestamp: str, text: str) -> None:
+        '''
+        Cache the text of a page's revision (either fetched
+        from the wiki, or just written to it by us)
+        '''
+        with self.__lock:
+            self.__pages[title] = {
+                'revid'    : revid,
+                'timestamp': timestamp,
+                'sha1'     : self.__hash(text),
+                'text'     : text
+            }
+
+    def save(self) -> None:
+        '''
+        Write cached pages to file
+        '''
+        with self.__lock:
+            # Write to a temporary file first so that a crash
+            # mid-write can't leave behind a corrupted cache
+            with open(self.__path + '.tmp', 'w') as file:
+                json.dump(self.__pages, file)
+            os.replace(self.__path + '.tmp', self.__path)
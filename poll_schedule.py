@@ -0,0 +1,44 @@
+from datetime import datetime
+
+class PollSchedule:
+    '''
+    Adaptive polling interval for daemon mode. Polls every min_interval
+    seconds after records change, and backs off towards max_interval
+    while they don't. Hours of the day in which records have recently
+    changed count as active hours, during which the interval never
+    backs off past active_max_interval.
+    '''
+    # Older activity fades a little every time records change, so
+    # active hours follow when records are being set these days
+    ACTIVITY_DECAY = 0.9
+    # Activity needed for an hour to count as active
+    ACTIVE_HOUR_THRESHOLD = 0.5
+
+    def __init__(self, min_interval: float = 30, max_interval: float = 900, \
+                 active_max_interval: float = 120, backoff: float = 1.5) -> None:
+        self.__min_interval: float        = min_interval
+        self.__max_interval: float        = max_interval
+        self.__active_max_interval: float = min(active_max_interval, max_interval)
+        self.__backoff: float             = backoff
+        self.__interval: float            = min_interval
+        # How much each hour of the day has seen records change lately
+        self.__hour_activity: list[float] = [0.0] * 24
+
+    def is_active_hour(self, hour: int) -> bool:
+        return self.__hour_activity[hour] >= self.ACTIVE_HOUR_THRESHOLD
+
+    def next_interval(self, changed: bool, now: datetime = None) -> float:
+        '''
+        Record whether the last poll found changed records,
+        and return how many seconds to wait until the next one
+        '''
+        hour = (now or datetime.now()).hour
+        if changed:
+            self.__hour_activity = [activity * self.ACTIVITY_DECAY for activity in self.__hour_activity]
+            self.__hour_activity[hour] += 1
+            self.__interval = self.__min_interval
+        else:
+            self.__interval = min(self.__max_interval, self.__interval * self.__backoff)
+        if self.is_active_hour(hour):
+            return min(self.__interval, self.__active_max_interval)
+        return self.__interval
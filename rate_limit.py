@@ -0,0 +1,60 @@
+import threading
+import time
+
+class TokenBucket:
+    '''
+    Thread-safe token bucket rate limiter. Each request takes a
+    token, and tokens refill at a steady rate up to a maximum burst.
+    The rate is cut back whenever the wiki reports that it is lagged
+    or asks us to back off, and then slowly recovers on success.
+    '''
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.1) -> None:
+        self.__max_rate: float  = rate
+        self.__min_rate: float  = min_rate
+        self.__rate: float      = rate
+        self.__burst: int       = burst
+        self.__tokens: float    = burst
+        self.__last_refill: float = time.monotonic()
+        # Requests aren't allowed through at all before this time
+        self.__paused_until: float = 0.0
+        self.__lock = threading.Lock()
+
+    def get_rate(self) -> float:
+        return self.__rate
+
+    def __refill(self, now: float) -> None:
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__last_refill) * self.__rate)
+        self.__last_refill = now
+
+    def acquire(self) -> None:
+        '''
+        Block until a token is available, then take it
+        '''
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__refill(now)
+                if now >= self.__paused_until and self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = max(self.__paused_until - now, (1 - self.__tokens) / self.__rate)
+            time.sleep(wait)
+
+    def backoff(self, retry_after: float) -> None:
+        '''
+        Stop handing out tokens for retry_after seconds and halve
+        the current rate (used for maxlag and Retry-After responses)
+        '''
+        with self.__lock:
+            now = time.monotonic()
+            self.__paused_until = max(self.__paused_until, now + retry_after)
+            self.__rate = max(self.__min_rate, self.__rate / 2)
+            self.__tokens = 0
+            self.__last_refill = now
+
+    def recover(self) -> None:
+        '''
+        Gradually restore the rate after a successful request
+        '''
+        with self.__lock:
+            self.__rate = min(self.__max_rate, self.__rate + self.__max_rate / 10)
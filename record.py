@@ -0,0 +1,43 @@
+import sys
+
+class Record:
+    '''
+    A single star's record. Star names and links are interned, since
+    the same ones show up over and over again across categories and runs.
+    strategy is only set (to 1 or 2) for multi-strategy 100c stars,
+    and is 0 otherwise.
+    '''
+    __slots__ = ('time', 'link', 'star_name', 'strategy')
+
+    def __init__(self, time: str, link: str | None, star_name: str, strategy: int = 0) -> None:
+        self.time: str        = time
+        self.link: str | None = sys.intern(link) if link else link
+        self.star_name: str   = sys.intern(star_name)
+        self.strategy: int    = strategy
+
+    def key(self) -> tuple[str, int]:
+        '''
+        Identifies which star (and strategy) a record is for
+        '''
+        return (self.star_name, self.strategy)
+
+    @staticmethod
+    def from_line(line: str) -> 'Record':
+        '''
+        Deserializes a record written as a single tab-separated
+        time, link, star name and strategy line (with no link
+        written as an empty field)
+        '''
+        time, link, star_name, strategy = line.rstrip('\n').split('\t')
+        return Record(time, link or None, star_name, int(strategy))
+
+    def __eq__(self, other: 'Record') -> bool:
+        return isinstance(other, Record) and self.time == other.time and self.link == other.link \
+               and self.star_name == other.star_name and self.strategy == other.strategy
+
+    def __hash__(self) -> int:
+        return hash((self.time, self.link, self.star_name, self.strategy))
+
+    def __repr__(self) -> str:
+        strategy = f', {self.strategy}' if self.strategy else ''
+        return f'Record({self.time!r}, {self.link!r}, {self.star_name!r}{strategy})'
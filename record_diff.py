@@ -0,0 +1,40 @@
+from common import RecordTime, get_record_keys
+from record import Record
+
+# Kinds of changes between saved and current records
+ADDED     = 'added'     # Star only exists in the current records
+FASTER    = 'faster'    # Current record has a faster time
+NEW_VIDEO = 'new_video' # Same time, but the current record has a new video link
+SLOWER    = 'slower'    # Current record has a slower time than the saved one
+REMOVED   = 'removed'   # Star only exists in the saved records
+
+def diff_records(local_records: list[Record], cur_records: list[Record]) \
+                 -> list[tuple[str, Record | None, Record | None]]:
+    '''
+    Joins saved and current records by star identity (rather than
+    by position), and returns a (change kind, local record, current
+    record) tuple for every record that changed, in current sheet
+    order (followed by any removed records)
+    '''
+    local_records_by_key = dict(zip(get_record_keys(local_records), local_records))
+    changes = []
+    for key, cur_record in zip(get_record_keys(cur_records), cur_records):
+        local_record = local_records_by_key.pop(key, None)
+        if local_record == None:
+            changes.append((ADDED, None, cur_record))
+            continue
+        if local_record == cur_record:
+            continue
+        # Each time string only ever gets parsed once
+        local_time = RecordTime.parse(local_record.time)
+        cur_time = RecordTime.parse(cur_record.time)
+        if cur_time < local_time:
+            changes.append((FASTER, local_record, cur_record))
+        elif cur_time > local_time:
+            changes.append((SLOWER, local_record, cur_record))
+        elif local_record.link != cur_record.link:
+            changes.append((NEW_VIDEO, local_record, cur_record))
+    # Whatever wasn't matched up is no longer on the sheet
+    for local_record in local_records_by_key.values():
+        changes.append((REMOVED, local_record, None))
+    return changes
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+
+from ast import literal_eval
+
+from common import get_record_keys
+from record import Record
+
+class RecordStore:
+    '''
+    SQLite-backed store of the last saved records for each category
+    (e.g. 'rta' or 'ss'), keyed by (category, star name, strategy index).
+    Records are passed in and out as Record objects. The key also
+    includes which occurrence of the star name a record is (see
+    get_record_keys).
+    '''
+    def __init__(self, path: str) -> None:
+        # Saving can happen from a different thread than loading
+        self.__conn = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock, self.__conn:
+            self.__conn.execute('''
+                CREATE TABLE IF NOT EXISTS records (
+                    category  TEXT    NOT NULL,
+                    star_name TEXT    NOT NULL,
+                    strategy   INTEGER NOT NULL,
+                    occurrence INTEGER NOT NULL,
+                    position   INTEGER NOT NULL,
+                    time       TEXT    NOT NULL,
+                    link       TEXT,
+                    PRIMARY KEY (category, star_name, strategy, occurrence)
+                )''')
+
+    @staticmethod
+    def __to_row(category: str, occurrence: int, position: int, record: Record) -> tuple:
+        return (category, record.star_name, record.strategy, occurrence, position, record.time, record.link)
+
+    @staticmethod
+    def __to_record(row: tuple) -> Record:
+        star_name, strategy, time, link = row
+        return Record(time, link, star_name, strategy)
+
+    def is_empty(self, category: str) -> bool:
+        with self.__lock:
+            return self.__conn.execute('SELECT 1 FROM records WHERE category = ? LIMIT 1',
+                                       (category,)).fetchone() == None
+
+    def load(self, category: str) -> list[Record]:
+        '''
+        Get every saved record in a category, in sheet order
+        '''
+        with self.__lock:
+            rows = self.__conn.execute('SELECT star_name, strategy, time, link FROM records '
+                                       'WHERE category = ? ORDER BY position', (category,))
+            return [self.__to_record(row) for row in rows]
+
+    def upsert(self, category: str, records: list[Record], skip_positions: set[int] = set()) -> int:
+        '''
+        Insert or update a category's records (in sheet order) in a single
+        transaction, only touching rows that actually changed, and return
+        how many rows changed. Records whose positions are in skip_positions
+        keep whatever was previously saved for them.
+        '''
+        rows = []
+        for position, (record, key) in enumerate(zip(records, get_record_keys(records))):
+            if position not in skip_positions:
+                rows.append(self.__to_row(category, key[2], position, record))
+        with self.__lock, self.__conn:
+            changes = self.__conn.total_changes
+            self.__conn.executemany('''
+                INSERT INTO records (category, star_name, strategy, occurrence, position, time, link)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (category, star_name, strategy, occurrence) DO UPDATE SET
+                    position = excluded.position, time = excluded.time, link = excluded.link
+                WHERE position != excluded.position OR time != excluded.time OR link IS NOT excluded.link''', rows)
+            return self.__conn.total_changes - changes
+
+    def import_text_file(self, category: str, path: str) -> None:
+        '''
+        Import records from a local records text file if the category is
+        empty. Files can either have one tab-separated line per record
+        (see Record.from_line), or be old-style files with one
+        literal_eval-able (time, link, name[, strategy]) tuple per line.
+        '''
+        if not os.path.exists(path) or not self.is_empty(category):
+            return
+        records = []
+        with open(path, 'r') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                if line.startswith('('):
+                    records.append(Record(*literal_eval(line.strip('\n'))))
+                else:
+                    records.append(Record.from_line(line))
+        self.upsert(category, records)
@@ -1,73 +1,113 @@
 import re
 
-from common import remove_mins_place
+from common import RecordTime
+from record import Record
+from tracing import span
 
-def replace_page_text(cur_page_text: str, parsed_records: str, \
-                      cur_records: list[tuple[str, str]], \
-                      new_records: list[tuple[str, str]]) -> tuple[str, str] | tuple[None, None]:
+# Have to be kinda quirky with this regex because 
+# findall has fun properties when it comes to groups :D 
+RECORD_TEXT_PATTERN = re.compile(r'(\d*\:?\d*\.\d+[^\] ]+?I?G?T?\)?) ?\(?(?P<specifier_text>[^\]\)]+)?[^\n]?')
+RECORD_LINK_PATTERN = re.compile(r'\[(?P<link>[^\s\]]+)')
+
+class InfoboxRecord:
+    '''
+    A single record in a speedrun infobox, with the character offsets
+    of its text in the page (so it can be replaced without searching
+    the page for it again) and its time, link, and specifier text
+    (e.g. 'IGT' or 'Course') parsed out
+    '''
+    __slots__ = ('start', 'end', 'text', 'time', 'link', 'specifier_text')
+
+    def __init__(self, page_text: str, start: int, end: int) -> None:
+        self.start: int = start
+        self.end: int   = end
+        self.text: str  = page_text[start:end]
+        parsed_text = RECORD_TEXT_PATTERN.search(self.text)
+        self.time: str = parsed_text.group(1)
+        self.specifier_text: str | None = parsed_text.group('specifier_text')
+        link = RECORD_LINK_PATTERN.search(self.text)
+        self.link: str | None = link.group('link') if link else None
+
+@span('parse_infobox')
+def parse_infobox(page_text: str) -> dict[str, tuple[int, int]]:
+    '''
+    Parses the fields of a page's {{speedrun_infobox}} or
+    {{speedrun_infobox_bowser_level}} in a single pass, and
+    returns the (start, end) offsets of each field's value
+    '''
+    fields = {}
+    start = page_text.find('{{speedrun_infobox')
+    if start == -1:
+        return fields
+    # Each field is on its own line, in the form '|name=value'
+    line_start = page_text.find('\n', start) + 1
+    while 0 < line_start < len(page_text) and not page_text.startswith('}}', line_start):
+        line_end = page_text.find('\n', line_start)
+        if line_end == -1:
+            line_end = len(page_text)
+        equals = page_text.find('=', line_start, line_end)
+        if page_text[line_start] == '|' and equals != -1:
+            fields[page_text[line_start+1:equals]] = (equals + 1, line_end)
+        line_start = line_end + 1
+    return fields
+
+def get_infobox_records(page_text: str, fields: dict[str, tuple[int, int]], \
+                        name: str, count: int = 1) -> list[InfoboxRecord]:
     '''
-    Replaces records in page text and returns the new page
-    and edit summary (or (None, None) if a record needs to be skipped) 
+    Gets the record(s) in an infobox field. Fields with two records
+    (Bowser stage course / red coins records, or multi-strategy 100c
+    records) have them separated by ' / '.
+    '''
+    start, end = fields[name]
+    if count == 1:
+        return [InfoboxRecord(page_text, start, end)]
+    # Split on the last ' / ' that comes right after a record
+    split = max(page_text.rfind('] / ', start, end), page_text.rfind(') / ', start, end)) + 1
+    if split == 0:
+        raise ValueError(f"Couldn't find two records in '{name}' field")
+    return [InfoboxRecord(page_text, start, split), InfoboxRecord(page_text, split + 3, end)]
+
+@span('replace_page_text')
+def replace_page_text(cur_page_text: str, cur_records: list[InfoboxRecord], \
+                      new_records: list[Record]) -> tuple[str, str] | tuple[None, None]:
+    '''
+    Replaces records in page text and returns the new page and edit
+    summary (or (None, None) if every record needs to be skipped)
     '''
-    # Have to be kinda quirky with this regex because 
-    # findall has fun properties when it comes to groups :D 
-    record_text_pattern = re.compile(r'(\d*\:?\d*\.\d+[^\] ]+?I?G?T?\)?) ?\(?(?P<specifier_text>[^\]\)]+)?[^\n]?')
     edit_summary = "Updated WR(s) '"
 
-    # If somehow replace_record is called for a page
-    # that is already updated (or has a faster time due
-    # to me ignoring the extensions sheet for now),
-    # don't bother updating it again.
-    for cur_record, new_record in zip(cur_records, new_records):
-        cur_record = record_text_pattern.findall(cur_record)
-        specifier_text = None
-        if len(cur_record) > 1:
-            specifier_text = cur_record[1]
-        cur_record_time = cur_record[0][0]
-        new_record_time = new_record[0]
-        if new_record_time == cur_record_time:
-            # Main script expects page_text to be None
-            # if it's meant to skip over a given record
-            return (None, None)
-        if 'IGT' in new_record_time:
-            new_record_time = new_record_time[:-6]
-        if ':' in new_record_time:
-            new_record_time = remove_mins_place(new_record_time)
-        new_record_time = float(new_record_time)
-        if 'IGT' in cur_record_time:
-            cur_record_time = cur_record_time[:-6]
-        if ':' in cur_record_time:
-            cur_record_time = remove_mins_place(cur_record_time)
-        cur_record_time = float(cur_record_time)
-        # TODO: modify the record_text_pattern regex to be
-        # able to also capture the link of the current records
-        # so that we can update the local records if a the page
-        # has a faster time than the "new" record being provided
-        if new_record_time > cur_record_time:
-            return (None, None)
-
-    # Replace provided record tuples with properly formatted
-    # strings, and update those records in the page text
-    new_page_text = cur_page_text
-    parsed_cur_records = record_text_pattern.findall(parsed_records)
-    for cur_record, new_record in zip(cur_records, new_records):
+    # If somehow replace_record is called for a record
+    # that is already updated (or has a faster time
+    # than either spreadsheet, e.g. from a manual edit),
+    # don't bother updating it again. Each record is
+    # checked on its own, so that one record being up to
+    # date doesn't hold back the rest of the page's records.
+    # TODO: use cur_record.link to update the local
+    # records if the page has a faster time than the
+    # "new" record being provided
+    records = [(cur_record, new_record) for cur_record, new_record in zip(cur_records, new_records)
+               if new_record.time != cur_record.time
+               and RecordTime.parse(new_record.time) <= RecordTime.parse(cur_record.time)]
+    if not records:
+        # Main script expects page_text to be None
+        # if it's meant to skip over every record
+        return (None, None)
+
+    # Replace provided records with properly formatted
+    # strings, and splice them into the page text
+    new_page_text = []
+    prev_end = 0
+    for cur_record, new_record in sorted(records, key=lambda i: i[0].start):
         # Note: this can't handle a scenario in which
         # there is a new rta record and a new best available
         # video. To handle this, there would need to be
         # logic that could search the whole spreadsheet
         # by row for the matching video link, and then use
-        # that cell's time in place of new_record[0] in the
+        # that cell's time in place of new_record.time in the
         # time comparison below
-
-        # Getting cur_record_time again because I couldn't find an easier way...
-        cur_record_time = record_text_pattern.search(cur_record).group(1)
-        new_record_time = new_record[0]
-        # Annoying that it's being done this way but
-        # it's the path of least resistance
-        specifier_text = None
-        for parsed_cur_record in parsed_cur_records:
-            if parsed_cur_record[0] == cur_record_time:
-                specifier_text = parsed_cur_record[1]
+        cur_record_time = cur_record.time
+        new_record_time = new_record.time
+        specifier_text = cur_record.specifier_text
 
         if specifier_text:
             # Best Available Video handling
@@ -75,110 +115,111 @@ def replace_page_text(cur_page_text: str, parsed_records: str, \
                 # If the best time currently has no video
                 # and video and this new entry still isn't
                 # faster, just replace the video
-                if float(new_record[0]) > float(cur_record_time):
-                    new_record = f'{new_record[0]} [{new_record[1]} ({specifier_text})]'
+                if RecordTime.parse(new_record.time) > RecordTime.parse(cur_record_time):
+                    new_record_text = f'{new_record.time} [{new_record.link} ({specifier_text})]'
                 else:
-                    new_record = f'[{new_record[1]} {new_record[0]}]'
+                    new_record_text = f'[{new_record.link} {new_record.time}]'
             # Other specifier text handling ('Course', 'with Red Coins', etc.)
+            elif specifier_text == 'IGT':
+                new_record_text = f'[{new_record.link} {new_record.time}]'
             else:
-                cur_record_time = record_text_pattern.search(cur_record + ']').group(1)
-                if specifier_text == 'IGT':
-                    new_record = f'[{new_record[1]} {new_record[0]}]'
-                else:
-                    new_record = f'[{new_record[1]} {new_record[0]} ({specifier_text})]'
+                new_record_text = f'[{new_record.link} {new_record.time} ({specifier_text})]'
         else:
-            new_record = f'[{new_record[1]} {new_record[0]}]'
+            new_record_text = f'[{new_record.link} {new_record.time}]'
         # Handle IGT text out here bc idk i guess it's easier?
         igt_text = ' (IGT)' if specifier_text == 'IGT' else ''
         # Make updated records list pretty
-        edit_summary += str(cur_record_time) + igt_text + "' to '" + new_record_time + "', '"
-        # Update parsed_records with the newly added record, so the next
-        # iteration will be looking for the correct string in the page text,
-        # and update the page text with the new parsed_records
-        new_parsed_records = parsed_records.replace(cur_record, new_record)
-        new_page_text = new_page_text.replace(parsed_records, new_parsed_records)
-        parsed_records = new_parsed_records
+        edit_summary += cur_record_time + igt_text + "' to '" + new_record_time + "', '"
+        new_page_text.append(cur_page_text[prev_end:cur_record.start])
+        new_page_text.append(new_record_text)
+        prev_end = cur_record.end
+    new_page_text.append(cur_page_text[prev_end:])
     edit_summary = edit_summary[:-3] # remove final hanging ", '"
 
-    return new_page_text, edit_summary
+    return ''.join(new_page_text), edit_summary
 
-def replace_record(cur_page_text: str, new_rta_record: tuple[str, str] = None, \
-                   new_ss_record: tuple[str, str] = None) -> tuple[str, str] | tuple[None, None]:
+@span('replace_record')
+def replace_record(cur_page_text: str, new_rta_record: Record = None, \
+                   new_ss_record: Record = None) -> tuple[str, str] | tuple[None, None]:
     '''
     Replaces specified records in page text (specify record params in call),
     and returns the new page text and edit summary
     '''
-    records_pattern = re.compile(r'rta_record=(?P<rta_record>.+[\]\)])\n'
-                                 +'\|ss_record=(?P<ss_record>.+[\]\)])\n')
-    parsed_records = records_pattern.search(cur_page_text)
+    fields = parse_infobox(cur_page_text)
 
-    new_records = [i for i in [new_rta_record, new_ss_record] if i != None]
+    new_records = []
     cur_records = []
     if new_rta_record:
-        cur_records.append(parsed_records.group('rta_record'))
+        new_records.append(new_rta_record)
+        cur_records += get_infobox_records(cur_page_text, fields, 'rta_record')
     if new_ss_record:
-        cur_records.append(parsed_records.group('ss_record'))
-    parsed_records = parsed_records.group() # we only need this as a string now
+        new_records.append(new_ss_record)
+        cur_records += get_infobox_records(cur_page_text, fields, 'ss_record')
 
-    return replace_page_text(cur_page_text, parsed_records, cur_records, new_records)
+    return replace_page_text(cur_page_text, cur_records, new_records)
 
-def replace_record_bowser(cur_page_text: str, new_rta_course_record: tuple[str, str] = None, \
-                          new_rta_reds_record:  tuple[str, str] = None, \
-                          new_ss_course_record: tuple[str, str] = None, \
-                          new_ss_reds_record:   tuple[str, str] = None, \
-                          new_throw_record:     tuple[str, str] = None) -> tuple[str, str] | tuple[None, None]:
+@span('replace_record_bowser')
+def replace_record_bowser(cur_page_text: str, new_rta_course_record: Record = None, \
+                          new_rta_reds_record:  Record = None, \
+                          new_ss_course_record: Record = None, \
+                          new_ss_reds_record:   Record = None, \
+                          new_throw_record:     Record = None) -> tuple[str, str] | tuple[None, None]:
     '''
     Replaces specified Bowser stage records in page text (specify record params in call),
     and returns the new page text and edit summary
     '''
-    records_pattern = re.compile(r'rta_record=(?P<rta_course_record>.+[\]\)]) \/ '
-                                 +'(?P<rta_reds_record>.+[\]\)])\n'
-                                 +'\|ss_record=(?P<ss_course_record>.+[\]\)]) \/ '
-                                 +'(?P<ss_reds_record>.+[\]\)])\n'
-                                 +'\|throws?_record=(?P<throw_record>.+[\]\)])\n')
-    parsed_records = records_pattern.search(cur_page_text)
-
-    new_records = [i for i in [new_rta_course_record, new_rta_reds_record,
-                   new_ss_course_record, new_ss_reds_record, new_throw_record] if i != None]
+    fields = parse_infobox(cur_page_text)
+    throw_field = 'throws_record' if 'throws_record' in fields else 'throw_record'
+
+    new_records = []
     cur_records = []
+    if new_rta_course_record or new_rta_reds_record:
+        rta_course_record, rta_reds_record = get_infobox_records(cur_page_text, fields, 'rta_record', 2)
+    if new_ss_course_record or new_ss_reds_record:
+        ss_course_record, ss_reds_record = get_infobox_records(cur_page_text, fields, 'ss_record', 2)
     if new_rta_course_record:
-        cur_records.append(parsed_records.group('rta_course_record'))
+        new_records.append(new_rta_course_record)
+        cur_records.append(rta_course_record)
     if new_rta_reds_record:
-        cur_records.append(parsed_records.group('rta_reds_record'))
+        new_records.append(new_rta_reds_record)
+        cur_records.append(rta_reds_record)
     if new_ss_course_record:
-        cur_records.append(parsed_records.group('ss_course_record'))
+        new_records.append(new_ss_course_record)
+        cur_records.append(ss_course_record)
     if new_ss_reds_record:
-        cur_records.append(parsed_records.group('ss_reds_record'))
+        new_records.append(new_ss_reds_record)
+        cur_records.append(ss_reds_record)
     if new_throw_record:
-        cur_records.append(parsed_records.group('throw_record'))
-    parsed_records = parsed_records.group() # we only need this as a string now
+        new_records.append(new_throw_record)
+        cur_records += get_infobox_records(cur_page_text, fields, throw_field)
 
-    return replace_page_text(cur_page_text, parsed_records, cur_records, new_records)
+    return replace_page_text(cur_page_text, cur_records, new_records)
 
-def replace_record_multi_100c(cur_page_text: str, new_rta_100c_record_1:  tuple[str, str] = None, \
-                              new_rta_100c_record_2: tuple[str, str] = None, \
-                              new_ss_record:   tuple[str, str] = None) -> tuple[str, str] | tuple[None, None]:
+@span('replace_record_multi_100c')
+def replace_record_multi_100c(cur_page_text: str, new_rta_100c_record_1:  Record = None, \
+                              new_rta_100c_record_2: Record = None, \
+                              new_ss_record:   Record = None) -> tuple[str, str] | tuple[None, None]:
     '''
     Replaces specified multi-route 100c records in page text (specify record params in call),
     and returns the new page text and edit summary
     '''
-    records_pattern = re.compile(r'rta_record=(?P<rta_100c_record_1>.+)\] \/ '
-                                 +'(?P<rta_100c_record_2>.+)\]\n'
-                                 +'\|ss_record=(?P<ss_record>.+)\]\n')
-    parsed_records = records_pattern.search(cur_page_text)
+    fields = parse_infobox(cur_page_text)
 
-    new_records = [i for i in [new_rta_100c_record_1, new_rta_100c_record_2,
-                   new_ss_record] if i != None]
+    new_records = []
     cur_records = []
+    if new_rta_100c_record_1 or new_rta_100c_record_2:
+        rta_100c_record_1, rta_100c_record_2 = get_infobox_records(cur_page_text, fields, 'rta_record', 2)
     if new_rta_100c_record_1:
-        cur_records.append(parsed_records.group('rta_100c_record_1'))
+        new_records.append(new_rta_100c_record_1)
+        cur_records.append(rta_100c_record_1)
     if new_rta_100c_record_2:
-        cur_records.append(parsed_records.group('rta_100c_record_2'))
+        new_records.append(new_rta_100c_record_2)
+        cur_records.append(rta_100c_record_2)
     if new_ss_record:
-        cur_records.append(parsed_records.group('ss_record'))
-    parsed_records = parsed_records.group() # we only need this as a string now
+        new_records.append(new_ss_record)
+        cur_records += get_infobox_records(cur_page_text, fields, 'ss_record')
 
-    return replace_page_text(cur_page_text, parsed_records, cur_records, new_records)
+    return replace_page_text(cur_page_text, cur_records, new_records)
 
 # Test Driver Code
 if __name__ == '__main__':
@@ -207,15 +248,15 @@ if __name__ == '__main__':
                 page_text += line
 
     if page_text_cpy == '100':
-        new_rta_100c_wr = ('1:08.36', 'https://www.youtube.com/watch?v=p8u_k2LIZyo')
-        new_ss_100c_wr = ('1:08.36', 'https://www.youtube.com/watch?v=p8u_k2LIZyo')
+        new_rta_100c_wr = Record('1:08.36', 'https://www.youtube.com/watch?v=p8u_k2LIZyo', '')
+        new_ss_100c_wr = Record('1:08.36', 'https://www.youtube.com/watch?v=p8u_k2LIZyo', '')
         new_text, edit_summary = replace_record(page_text, new_rta_record=new_rta_100c_wr, new_ss_record=new_ss_100c_wr)
     elif page_text_cpy == 'bowser':
-        # new_bowser_course_rta_wr = ('26.30', 'https://www.youtube.com/watch?v=wr4x8ngvhjc')
-        # new_bowser_reds_rta_wr = ('42.30', 'https://www.youtube.com/watch?v=Do5_wU9X1pc')
-        # new_bowser_course_ss_wr = ('23.76 (IGT)', 'https://youtu.be/8dwSydGAJsk')
-        # new_bowser_reds_ss_wr = ('41.72', 'https://youtu.be/uhk_vPPXhLM')
-        new_bowser_throw_wr = ('24.83', 'https://www.youtube.com/watch?v=84r1NnU5WRc')
+        # new_bowser_course_rta_wr = Record('26.30', 'https://www.youtube.com/watch?v=wr4x8ngvhjc', '')
+        # new_bowser_reds_rta_wr = Record('42.30', 'https://www.youtube.com/watch?v=Do5_wU9X1pc', '')
+        # new_bowser_course_ss_wr = Record('23.76 (IGT)', 'https://youtu.be/8dwSydGAJsk', '')
+        # new_bowser_reds_ss_wr = Record('41.72', 'https://youtu.be/uhk_vPPXhLM', '')
+        new_bowser_throw_wr = Record('24.83', 'https://www.youtube.com/watch?v=84r1NnU5WRc', '')
         # new_text, edit_summary = \
             # replace_record_bowser(page_text, new_rta_course_record=new_bowser_course_rta_wr,
             #                     new_rta_reds_record=new_bowser_reds_rta_wr, new_ss_course_record= \
@@ -223,18 +264,18 @@ if __name__ == '__main__':
             #                     new_throw_record=new_bowser_throw_wr)
         new_text, edit_summary = replace_record_bowser(page_text, new_throw_record=new_bowser_throw_wr)
     elif page_text_cpy == 'reg':
-        new_rta_wr = ('17.40', 'https://www.youtube.com/watch?v=W72cyc5sESo')
+        new_rta_wr = Record('17.40', 'https://www.youtube.com/watch?v=W72cyc5sESo', '')
         # new_rta_wr = None
-        new_ss_wr = ('8.20', 'https://www.youtube.com/watch?v=84r1NnU5WRc')
+        new_ss_wr = Record('8.20', 'https://www.youtube.com/watch?v=84r1NnU5WRc', '')
         new_text, edit_summary = replace_record(page_text, new_rta_record=new_rta_wr, new_ss_record=new_ss_wr)
     elif page_text_cpy == 'bav':
-        new_rta_wr = ('17.40', 'https://www.youtube.com/watch?v=W72cyc5sESo')
+        new_rta_wr = Record('17.40', 'https://www.youtube.com/watch?v=W72cyc5sESo', '')
         # new_rta_wr = None
-        new_ss_wr = ('8.20', 'https://www.youtube.com/watch?v=84r1NnU5WRc')
+        new_ss_wr = Record('8.20', 'https://www.youtube.com/watch?v=84r1NnU5WRc', '')
         new_text, edit_summary = replace_record(page_text, new_rta_record=new_rta_wr, new_ss_record=new_ss_wr)
     # new_text, edit_summary = replace_record_bowser(page_text, new_throw_record=new_bowser_throw_wr)
 
-    # new_rta_100c_wr = ('1:29.53', 'https://youtu.be/9YBxtwAJKaU')
+    # new_rta_100c_wr = Record('1:29.53', 'https://youtu.be/9YBxtwAJKaU', '')
     # new_text, edit_summary = replace_record_multi_100c(page_text, new_rta_100c_record_1=new_rta_100c_wr)
     ind = new_text.index('}')
     new_text = new_text[:ind]
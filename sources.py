@@ -0,0 +1,127 @@
+import json
+import os
+
+# Kinds of spreadsheets, which each have their own layout (and parser)
+RTA = 'rta'
+SS  = 'ss'
+
+# Optional config of which spreadsheets records are read from, and which
+# sets of wiki pages they're written to (see load_boards for its format)
+CONFIG_FILE = '.\\sources.json'
+
+# Single Star Spreadsheet ID and column range
+SS_SHEET = '1_cOIEnuKIQ-3LA_U0ygpiL87PTSBPlHmKDId0vC7alo'
+SS_RANGE = 'Singlestar!B:E'
+# RTA Spreadsheet ID and column range
+RTA_SHEET = '1J20aivGnvLlAuyRIMMclIFUmrkHXUzgcDmYa31gdtCI'
+RTA_RANGE = ['Ultimate Star Spreadsheet v2!A:B']
+# Range of the RTA spreadsheet's extensions sheet, which has strategies
+# that aren't on the main sheet in the same layout (but isn't always
+# organized by star). Its tab name and layout haven't been checked
+# against the real spreadsheet yet, so it's only read if it's added
+# after the main sheet's range in the RTA source's config.
+RTA_EXTENSIONS_RANGE = 'Extensions!A:B'
+# Raw spreadsheet values used instead of the real sheets when
+# creds is 'DEBUG' (single star values as returned by the API
+# with valueRenderOption='FORMULA', RTA values as rowData JSON)
+SS_DEBUG_FILE  = '.\\test_pages\\test_ss_raw.json'
+RTA_DEBUG_FILE = '.\\test_pages\\j2.json'
+# Prefix of the titles of the RTA Guide's star pages
+RTA_GUIDE_PREFIX = 'RTA Guide/'
+
+class Source:
+    '''
+    A spreadsheet that records are read from. name identifies the
+    source's local records, sheet fingerprint and block cache (so it
+    shouldn't change once records have been saved under it), and
+    label is how it's referred to in messages. RTA sources can have a
+    second range for an extensions sheet, single star sources only
+    use their first range.
+    '''
+    __slots__ = ('name', 'kind', 'label', 'sheet_id', 'ranges', 'debug_file')
+
+    def __init__(self, name: str, kind: str, label: str, sheet_id: str, ranges: list[str], \
+                 debug_file: str = None) -> None:
+        self.name: str        = name
+        self.kind: str        = kind
+        self.label: str       = label
+        self.sheet_id: str    = sheet_id
+        self.ranges: list[str] = ranges
+        self.debug_file: str  = debug_file
+
+    def get_block_cache_file(self) -> str:
+        '''
+        Get the file that parses of the source's blocks of rows are cached in
+        '''
+        return f'.\\local_records\\{self.name}_block_cache.json'
+
+    def __eq__(self, other: 'Source') -> bool:
+        return isinstance(other, Source) and all(getattr(self, attr) == getattr(other, attr) for attr in self.__slots__)
+
+class Board:
+    '''
+    A set of wiki pages (e.g. the RTA Guide's star pages) that
+    records from one or more sources are written to. A page's
+    title is title_prefix followed by its star name.
+    '''
+    __slots__ = ('name', 'title_prefix', 'sources')
+
+    def __init__(self, name: str, title_prefix: str, sources: list[Source]) -> None:
+        self.name: str            = name
+        self.title_prefix: str    = title_prefix
+        self.sources: list[Source] = sources
+
+def get_default_boards() -> list[Board]:
+    '''
+    Get the boards used when there's no config file: the RTA Guide,
+    from the RTA and single star spreadsheets
+    '''
+    return [Board('RTA Guide', RTA_GUIDE_PREFIX, [
+        # The names of the default sources are the categories their
+        # records were saved under before sources were configurable
+        Source('rta', RTA, 'RTA', RTA_SHEET, RTA_RANGE, RTA_DEBUG_FILE),
+        Source('ss', SS, 'single star', SS_SHEET, [SS_RANGE], SS_DEBUG_FILE)
+    ])]
+
+def load_boards(path: str = CONFIG_FILE) -> list[Board]:
+    '''
+    Load every board (and its sources) from a config file (or get the
+    default boards if there isn't one), which is JSON of the form
+
+        {"boards": [{"name": ..., "title_prefix": ..., "sources": [
+            {"name": ..., "kind": "rta" or "ss", "label": ..., "sheet_id": ...,
+             "ranges": [...], "debug_file": ...}, ...]}, ...]}
+
+    Boards can share sources (e.g. one sheet feeding two sets of pages)
+    by giving them sources with the same name, which are only read once.
+    '''
+    if not os.path.exists(path):
+        return get_default_boards()
+    with open(path, 'r') as file:
+        config = json.load(file)
+    boards = []
+    sources = {}
+    for board_config in config['boards']:
+        board_sources = []
+        for source_config in board_config['sources']:
+            source = Source(source_config['name'], source_config['kind'], source_config.get('label', source_config['name']),
+                            source_config['sheet_id'], source_config['ranges'], source_config.get('debug_file'))
+            if not source.kind in (RTA, SS):
+                raise ValueError(f'Source "{source.name}" has unknown kind "{source.kind}"')
+            if source.name in sources and sources[source.name] != source:
+                raise ValueError(f'Sources named "{source.name}" are configured differently')
+            board_sources.append(sources.setdefault(source.name, source))
+        boards.append(Board(board_config['name'], board_config['title_prefix'], board_sources))
+    if not sources:
+        raise ValueError(f'No sources are configured in {path}')
+    return boards
+
+def get_board_sources(boards: list[Board]) -> list[Source]:
+    '''
+    Get every source of every board (with shared sources only showing up once)
+    '''
+    sources = {}
+    for board in boards:
+        for source in board.sources:
+            sources.setdefault(source.name, source)
+    return list(sources.values())
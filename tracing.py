@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+class Span:
+    '''
+    A single timed phase of a run. name includes the names of the
+    spans it's nested in (on the same thread), e.g. 'main/login'.
+    '''
+    __slots__ = ('name', 'args', 'start', 'end', 'thread_id', 'process_id')
+
+    def __init__(self, name: str, args: dict, start: float, thread_id: int) -> None:
+        self.name: str       = name
+        self.args: dict      = args
+        self.start: float    = start
+        self.end: float      = None
+        self.thread_id: int  = thread_id
+        self.process_id: int = os.getpid()
+
+    def get_duration(self) -> float:
+        return (self.end if self.end != None else time.perf_counter()) - self.start
+
+class Tracer:
+    '''
+    Thread-safe collector of Spans for a single run
+    '''
+    def __init__(self) -> None:
+        self.__spans: list[Span] = []
+        self.__lock = threading.Lock()
+        # Names of the spans currently open on each thread
+        self.__local = threading.local()
+        self.__start: float = time.perf_counter()
+
+    def reset(self) -> None:
+        '''
+        Drop every finished span (e.g. from a previous run), keeping
+        any that are still open (e.g. the span of the run resetting it)
+        '''
+        with self.__lock:
+            self.__spans = [cur_span for cur_span in self.__spans if cur_span.end == None]
+            self.__start = min([cur_span.start for cur_span in self.__spans], default=time.perf_counter())
+
+    @contextmanager
+    def span(self, name: str, **args):
+        '''
+        Time everything run inside the with block (or decorated
+        function) as a span, nested inside any span already open on
+        the current thread. args are shown alongside the span in
+        the Chrome trace (e.g. which star the span is for).
+        '''
+        stack = getattr(self.__local, 'stack', None)
+        if stack == None:
+            stack = self.__local.stack = []
+        stack.append(name)
+        cur_span = Span('/'.join(stack), args, time.perf_counter(), threading.get_ident())
+        with self.__lock:
+            self.__spans.append(cur_span)
+        try:
+            yield cur_span
+        finally:
+            cur_span.end = time.perf_counter()
+            stack.pop()
+
+    def add_spans(self, spans: list[Span]) -> None:
+        '''
+        Add spans traced by another process (e.g. a worker's, whose
+        times line up with this process's as perf_counter is system-wide)
+        '''
+        with self.__lock:
+            self.__spans.extend(spans)
+            self.__spans.sort(key=lambda cur_span: cur_span.start)
+
+    def get_spans(self) -> list[Span]:
+        '''
+        Get every span so far, in the order they were started
+        '''
+        with self.__lock:
+            return self.__spans.copy()
+
+    def get_chrome_trace(self) -> dict:
+        '''
+        Get spans in the Chrome trace event format (which can be
+        opened in chrome://tracing or https://ui.perfetto.dev)
+        '''
+        events = []
+        thread_ids = {}
+        for cur_span in self.get_spans():
+            events.append({
+                'name': cur_span.name.rsplit('/', 1)[-1],
+                'cat' : cur_span.name.split('/', 1)[0],
+                'ph'  : 'X',
+                'ts'  : (cur_span.start - self.__start) * 1e6,
+                'dur' : cur_span.get_duration() * 1e6,
+                'pid' : cur_span.process_id,
+                # Number threads in the order they show up, rather
+                # than using the OS's much less readable thread ids
+                'tid' : thread_ids.setdefault((cur_span.process_id, cur_span.thread_id), len(thread_ids)),
+                'args': {key: str(value) for key, value in cur_span.args.items()}
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+# Tracer shared by every module for the current run
+TRACER = Tracer()
+
+def span(name: str, **args):
+    '''
+    Shorthand for TRACER.span, usable as either a
+    context manager or a function decorator
+    '''
+    return TRACER.span(name, **args)